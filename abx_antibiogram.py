@@ -0,0 +1,47 @@
+import streamlit as st
+
+from antibiogram import MIN_ISOLATES, PERIODS, STRATA, antibiogram_table
+from datasets import load_antibiogram
+from diagnostics import start_run
+from views import dedup_filter, diagnostics_panel
+
+start_run("abx_antibiogram")
+
+st.set_page_config(layout="wide", page_title="Antibiogramme cumulé - Staphylococcus aureus")
+st.title("🧫 Antibiogramme cumulé - Staphylococcus aureus")
+
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
+    period = st.radio("Période", list(PERIODS), format_func=PERIODS.get, horizontal=True)
+    by = st.selectbox("Stratification", list(STRATA), format_func=STRATA.get)
+
+# Effectifs S / I / R par (période, strate, antibiotique), partagés entre sessions
+table = load_antibiogram(period, by, dedup)
+period_label = PERIODS[period]
+
+with st.sidebar:
+    periods = sorted(table[period_label].unique())
+    selected_period = st.selectbox(period_label, periods, index=len(periods) - 1)
+    value = st.radio("Valeur affichée", ["%S", "%I", "%R"], horizontal=True)
+    hide_small = st.checkbox(f"Masquer les strates de moins de {MIN_ISOLATES} isolats", value=True)
+
+selection = table[table[period_label] == selected_period]
+if hide_small:
+    selection = selection[selection["Isolats"] >= MIN_ISOLATES]
+
+st.caption(f"{value} par antibiotique ; non publié (vide) sous {MIN_ISOLATES} isolats testés.")
+if selection.empty:
+    st.info("Aucune strate à afficher pour cette période.")
+else:
+    wide = antibiogram_table(selection, value).drop(columns=period_label)
+    st.dataframe(wide, use_container_width=True, hide_index=True)
+
+    st.download_button(
+        "Télécharger (CSV, effectifs détaillés)",
+        selection.to_csv(index=False).encode("utf-8"),
+        file_name=f"antibiogramme_{selected_period}_{by or 'ensemble'}.csv",
+        mime="text/csv",
+    )
+
+diagnostics_panel()
@@ -0,0 +1,50 @@
+import numpy as np
+import streamlit as st
+
+from coresistance import MIN_PAIR_TESTS, co_resistance
+from datasets import load_cube, load_isolates
+from diagnostics import start_run
+from figure_cache import cached_figure
+from figures import coresistance_figure
+from phenotypes import PHENOTYPES
+from views import dedup_filter, diagnostics_panel, plotly_chart, ward_nature_filters
+
+start_run("abx_coresistance")
+
+st.set_page_config(layout="wide", page_title="Co-résistance - Staphylococcus aureus")
+st.title("🔗 Co-résistance entre antibiotiques - Staphylococcus aureus")
+
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
+
+cube = load_cube(dedup)
+meta, matrix = load_isolates(dedup)
+
+with st.sidebar:
+    selected_weeks = st.select_slider(
+        "Sélectionnez les semaines",
+        options=cube.labels,
+        value=(cube.labels[0], cube.labels[-1])
+    )
+    selected_pheno = st.multiselect("Phénotypes", PHENOTYPES, default=PHENOTYPES)
+    selected_ward, selected_nature = ward_nature_filters(cube)
+    min_tests = st.slider("Isolats minimum par paire", 1, 100, MIN_PAIR_TESTS)
+
+# Isolats de la sélection (index du cube), puis toutes les paires d'un coup
+start, end = cube.position[selected_weeks[0]], cube.position[selected_weeks[1]]
+rows = cube.isolate_rows(start, end, selected_ward, selected_nature)
+rows = rows[np.isin(cube.isolate_phenotypes[rows], [PHENOTYPES.index(p) for p in selected_pheno])]
+result = co_resistance(matrix.align(cube.row_labels), rows)
+filters = (dedup, selected_weeks, selected_pheno, selected_ward, selected_nature, min_tests)
+
+st.caption(f"{result.isolates} isolat(s), {len(result)} antibiotique(s) testé(s) dans la sélection")
+if result.isolates == 0:
+    st.info("Aucun isolat dans la sélection.")
+else:
+    plotly_chart(cached_figure("coresistance.heatmap", filters, lambda: coresistance_figure(result, min_tests)))
+
+    st.subheader("📋 Paires les plus co-résistantes")
+    st.dataframe(result.pairs(min_tests), use_container_width=True, hide_index=True)
+
+diagnostics_panel()
@@ -1,38 +1,52 @@
 
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
 
-@st.cache_data
-def load_weekly_abx():
-    df = pd.read_excel("weekly_abx_resistance.xlsx")
-    return df
+from alerts import DEFAULT_WINDOW, alert_table, rate
+from cube import ALL_WARDS
+from datasets import load_resistance_groups, load_resistance_series
+from diagnostics import start_run
+from figure_cache import cached_figure
+from figures import resistance_figure
+from views import dedup_filter, diagnostics_panel, plotly_chart
 
-df_abx = load_weekly_abx()
+start_run("abx_weekly_graph")
+
+with st.sidebar:
+    dedup = dedup_filter()
+
+# %R hebdomadaire de tous les antibiotiques, déjà regroupé par antibiotique
+# et partagé entre toutes les sessions
+groups = load_resistance_groups("week", dedup)
 
 st.title("📆 Résistance hebdomadaire - Autres antibiotiques")
 
-abx_list = sorted(df_abx["Antibiotic"].unique())
-selected_abx = st.multiselect("Choisir antibiotiques à afficher", abx_list, default=abx_list[:3])
-
-fig = go.Figure()
-for abx in selected_abx:
-    data = df_abx[df_abx["Antibiotic"] == abx]
-    fig.add_trace(go.Scatter(
-        x=data["Week"],
-        y=data["% Resistance"],
-        mode="lines+markers",
-        name=abx,
-        hovertemplate="<b>%{text}</b><br>Semaine: %{x}<br>%R: %{y:.1f}%",
-        text=[abx] * len(data)
-    ))
-
-fig.update_layout(
-    title="Évolution hebdomadaire de la résistance (%R)",
-    xaxis_title="Semaine",
-    yaxis_title="% Résistance",
-    hovermode="x unified",
-    yaxis=dict(range=[0, 100])
+abx_list = list(groups)
+default_abx = [abx for abx in ["Clindamycine", "Cotrimoxazole", "Daptomycine"] if abx in abx_list]
+selected_abx = st.multiselect("Choisir antibiotiques à afficher", abx_list, default=default_abx or abx_list[:3])
+
+fig = cached_figure("abx_weekly.resistance", (dedup, selected_abx), lambda: resistance_figure(groups, selected_abx))
+plotly_chart(fig)
+
+# Alertes %R : Tukey et moyenne + 2 SD pour chaque antibiotique x service,
+# évaluées d'un bloc à chaque interaction
+st.subheader("🚨 Alertes de résistance")
+series, weeks, tested, resistant = load_resistance_series(dedup)
+window = st.select_slider(
+    "Période de référence",
+    options=[4, 8, 12, 26, None],
+    value=DEFAULT_WINDOW,
+    format_func=lambda w: "Tout l'historique" if w is None else f"{w} semaines précédentes",
 )
-
-st.plotly_chart(fig, use_container_width=True)
+by_ward = st.checkbox("Détailler par service", value=False)
+
+alerts = alert_table(rate(resistant, tested), series, weeks, window, tested=tested)
+alerts = alerts[alerts["Antibiotic"].isin(selected_abx)]
+if not by_ward:
+    alerts = alerts[alerts["Service"] == ALL_WARDS]
+alerts = alerts.sort_values(["Période", "Antibiotic"], ascending=[False, True], ignore_index=True)
+if alerts.empty:
+    st.success("Aucune alerte pour les antibiotiques sélectionnés.")
+else:
+    st.dataframe(alerts, use_container_width=True, hide_index=True)
+
+diagnostics_panel()
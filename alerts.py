@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from cube import ALERT_SD
+from diagnostics import timed
+
+# Moteur d'alerte commun : règle de Tukey (Q1 - 1,5 IQR / Q3 + 1,5 IQR) et
+# règle moyenne + 2 SD, calculées pour toutes les séries et toutes les
+# périodes d'un seul bloc. Les valeurs forment un tableau (séries x périodes)
+# où NaN signifie « pas de mesure » ; la référence de chaque période est soit
+# tout l'historique (window=None), soit les `window` périodes précédentes.
+TUKEY_K = 1.5
+MIN_PERIODS = 4
+# Fenêtre glissante par défaut des alertes %R hebdomadaires (en semaines).
+DEFAULT_WINDOW = 8
+RULES = {"tukey": "Tukey", "sd": f"Moyenne + {ALERT_SD} SD"}
+
+
+def _baseline(values, window):
+    # (séries, périodes, n) : valeurs de référence de chaque période, sans copie.
+    if window is None:
+        return values[:, None, :]
+    padded = np.concatenate([np.full((len(values), window), np.nan), values[:, :-1]], axis=1)
+    return sliding_window_view(padded, window, axis=1)
+
+
+def _quantile(ordered, n, q):
+    # Quantile linéaire (comme pandas/numpy) sur des fenêtres triées, NaN en fin.
+    pos = q * np.maximum(n - 1, 0)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+    low = np.take_along_axis(ordered, lo[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, hi[..., None], axis=-1)[..., 0]
+    return low + (high - low) * (pos - lo)
+
+
+def thresholds(values, window=None, min_periods=MIN_PERIODS):
+    # Seuils (séries x périodes) ; NaN quand la référence compte moins de
+    # min_periods mesures.
+    values = np.asarray(values, dtype=np.float64)
+    base = _baseline(values, window)
+    ordered = np.sort(base, axis=-1)
+    valid = ~np.isnan(base)
+    n = valid.sum(axis=-1)
+    total = np.where(valid, base, 0).sum(axis=-1)
+    squares = np.where(valid, base * base, 0).sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / n
+        std = np.sqrt(np.maximum(squares - total * mean, 0) / (n - 1))
+    q1, q3 = _quantile(ordered, n, 0.25), _quantile(ordered, n, 0.75)
+    iqr = q3 - q1
+
+    out = {
+        "q1": q1, "q3": q3,
+        "tukey_low": q1 - TUKEY_K * iqr, "tukey_high": q3 + TUKEY_K * iqr,
+        "mean": mean, "std": std, "sd_high": mean + ALERT_SD * std,
+    }
+    enough = n >= min_periods
+    shape = values.shape
+    return {name: np.where(enough, np.broadcast_to(array, shape), np.nan) for name, array in out.items()}
+
+
+def rate(numerator, denominator):
+    # Pourcentage par cellule, NaN là où il n'y a aucune mesure.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator * 100, np.nan)
+
+
+@timed("alerts")
+def alert_table(values, series, periods, window=None, min_periods=MIN_PERIODS, tested=None):
+    # Table compacte des alertes : une ligne par (série, période, règle) en
+    # dépassement. series décrit les lignes de values (un DataFrame),
+    # periods les colonnes ; tested (optionnel) ajoute l'effectif de la cellule.
+    values = np.asarray(values, dtype=np.float64)
+    limits = thresholds(values, window, min_periods)
+    checks = [
+        ("tukey", "au-dessus", values > limits["tukey_high"], limits["tukey_high"]),
+        ("tukey", "en dessous", values < limits["tukey_low"], limits["tukey_low"]),
+        ("sd", "au-dessus", values > limits["sd_high"], limits["sd_high"]),
+    ]
+    periods = np.asarray(periods)
+    parts = []
+    for rule, direction, hit, limit in checks:
+        rows, cols = np.nonzero(hit)
+        part = series.iloc[rows].reset_index(drop=True)
+        part["Période"] = periods[cols]
+        part["Valeur"] = values[rows, cols]
+        if tested is not None:
+            part["Tests"] = np.asarray(tested)[rows, cols]
+        part["Règle"] = RULES[rule]
+        part["Sens"] = direction
+        part["Seuil"] = limit[rows, cols]
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
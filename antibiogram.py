@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from category_index import CategoryIndex
+from cube import ALL_NATURES, ALL_WARDS, NATURE_COLUMN, WARD_COLUMN
+from diagnostics import timed
+from isolates import DATE_COLUMN
+from sir_matrix import INTERMEDIATE, RESISTANT, SUSCEPTIBLE
+
+# Antibiogramme cumulé (annuel ou trimestriel) construit directement à
+# partir des isolats, sans passer par le classeur saisi à la main : une
+# seule réduction (bincount) sur les cellules testées de la matrice S/I/R
+# donne les effectifs S / I / R de chaque (période, strate, antibiotique).
+# Les marges « tous services » / « toutes natures » sont ajoutées par
+# sommation, comme dans le cube hebdomadaire. Règle de suppression : le %
+# n'est pas publié sous MIN_ISOLATES isolats testés.
+MIN_ISOLATES = 30
+PERIODS = {"year": "Année", "quarter": "Trimestre"}
+STRATA = {
+    None: "Ensemble",
+    "ward": "Service",
+    "nature": "Nature de prélèvement",
+    "ward_nature": "Service x nature",
+}
+_STRATA_COLUMNS = {
+    None: [],
+    "ward": [(WARD_COLUMN, "Service", ALL_WARDS)],
+    "nature": [(NATURE_COLUMN, "Nature", ALL_NATURES)],
+    "ward_nature": [(WARD_COLUMN, "Service", ALL_WARDS), (NATURE_COLUMN, "Nature", ALL_NATURES)],
+}
+
+
+def _periods(dates, period):
+    if period == "year":
+        return dates.dt.year.astype(str)
+    if period == "quarter":
+        return dates.dt.year.astype(str) + "-T" + dates.dt.quarter.astype(str)
+    raise ValueError(f"Période inconnue : {period}")
+
+
+def _add_margins(counts, axes):
+    # Dernier indice de chaque axe de strate = somme des autres (« tous »).
+    for axis in axes:
+        total = np.take(counts, np.arange(counts.shape[axis] - 1), axis=axis).sum(axis=axis)
+        index = [slice(None)] * counts.ndim
+        index[axis] = -1
+        counts[tuple(index)] = total
+    return counts
+
+
+@timed("antibiogram")
+def antibiogram(meta, matrix, period="year", by=None, min_isolates=MIN_ISOLATES):
+    # Table longue : Période, [Service], [Nature], Code, Antibiotique,
+    # Isolats (de la strate), Testés, S, I, R, %S, %I, %R.
+    dates = pd.to_datetime(meta[DATE_COLUMN], errors="coerce")
+    meta = meta[dates.notna()]
+    matrix = matrix.align(meta.index)
+    strata = _STRATA_COLUMNS[by]
+
+    indexes = [CategoryIndex(_periods(dates[meta.index], period))]
+    indexes += [CategoryIndex(meta[column]) for column, _, _ in strata]
+    # Axe période, axes de strates (+1 case « tous »), antibiotique, résultat.
+    shape = [len(indexes[0])] + [len(index) + 1 for index in indexes[1:]]
+    n_abx = len(matrix.columns)
+    group = np.zeros(len(meta), dtype=np.int64)
+    for index, size in zip(indexes, shape):
+        group = group * size + index.codes
+
+    rows, cols = np.nonzero(matrix.codes)
+    cell = (group[rows] * n_abx + cols) * 4 + matrix.codes[rows, cols]
+    counts = np.bincount(cell, minlength=int(np.prod(shape)) * n_abx * 4).reshape(shape + [n_abx, 4])
+    isolates = np.bincount(group, minlength=int(np.prod(shape))).reshape(shape)
+    strata_axes = range(1, len(shape))
+    counts = _add_margins(counts, strata_axes)
+    isolates = _add_margins(isolates, strata_axes)
+
+    s, i, r = counts[..., SUSCEPTIBLE], counts[..., INTERMEDIATE], counts[..., RESISTANT]
+    tested = s + i + r
+    cells = np.nonzero(tested)
+    out = pd.DataFrame({PERIODS[period]: np.array(indexes[0].categories, dtype=object)[cells[0]]})
+    for axis, ((_, label, all_label), index) in enumerate(zip(strata, indexes[1:]), start=1):
+        out[label] = np.array(index.categories + [all_label], dtype=object)[cells[axis]]
+    abx = cells[-1]
+    out["Code"] = np.array(matrix.columns, dtype=object)[abx]
+    out["Antibiotique"] = np.array(matrix.names, dtype=object)[abx]
+    out["Isolats"] = isolates[cells[:-1]]
+    out["Testés"] = tested[cells]
+    for label, values in (("S", s), ("I", i), ("R", r)):
+        out[label] = values[cells]
+    published = out["Testés"] >= min_isolates
+    for label in ("S", "I", "R"):
+        out[f"%{label}"] = np.where(published, out[label] / out["Testés"] * 100, np.nan)
+    return out
+
+
+def antibiogram_table(table, value="%S"):
+    # Présentation usuelle : une ligne par (période, strate), une colonne par antibiotique.
+    keys = [c for c in table.columns if c in list(PERIODS.values()) + ["Service", "Nature"]]
+    indexed = table.set_index(keys + ["Antibiotique"])
+    # Antibiotiques les plus testés d'abord ; ceux jamais publiés sont retirés.
+    order = table.groupby("Antibiotique")["Testés"].sum().sort_values(ascending=False).index
+    wide = indexed[value].unstack()[order].dropna(axis=1, how="all")
+    wide.insert(0, "Isolats", indexed["Isolats"].groupby(level=keys).first())
+    wide.columns.name = None
+    return wide.reset_index()
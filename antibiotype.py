@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+from category_index import CategoryIndex
+from cube import WARD_COLUMN
+from dedup import PATIENT_COLUMN
+from diagnostics import timed
+from isolates import DATE_COLUMN
+from phenotypes import PHENOTYPES, classify_phenotypes
+from sir_matrix import NOT_TESTED, RESISTANT, SUSCEPTIBLE
+
+# Antibiotypes et clusters suspects. Le profil S/I/R de chaque isolat est
+# rangé dans trois plans de bits (testé, R, S) empaquetés en mots de 64
+# bits : deux isolats sont discordants sur un antibiotique testé pour les
+# deux quand leurs bits R ou S diffèrent, et la distance de Hamming est un
+# popcount sur quelques mots.
+# Les paires candidates sont limitées au même service et à WINDOW_DAYS
+# jours d'écart (tri par service puis date, fenêtre glissante), jamais
+# l'ensemble des paires. Les paires d'au plus MAX_DISTANCE antibiotiques
+# discordants, entre patients différents, forment les arêtes ; un cluster
+# est une composante connexe d'au moins MIN_PATIENTS patients.
+# Les profils de résistance de fond (aucune résistance, érythromycine
+# seule...), portés par plus de COMMON_SHARE des isolats, ne signalent pas
+# une transmission : ces isolats n'entrent pas dans les paires.
+MAX_DISTANCE = 1
+WINDOW_DAYS = 28
+MIN_SHARED = 10
+MIN_PATIENTS = 2
+COMMON_SHARE = 0.05
+PAIR_CHUNK = 1 << 20
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _pack(mask):
+    # (isolats x antibiotiques) booléen -> (isolats x mots) uint64.
+    packed = np.packbits(mask, axis=1, bitorder="little")
+    padding = -packed.shape[1] % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def _row_groups(words):
+    # Numéro de groupe par ligne identique (hachage, sans tri lexicographique) et effectifs.
+    groups = pd.DataFrame(words).groupby(list(range(words.shape[1])), sort=False).ngroup().to_numpy()
+    return groups, np.bincount(groups)
+
+
+def _popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[np.ascontiguousarray(words).view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+class Fingerprints:
+    def __init__(self, matrix):
+        used = matrix.tested().any(axis=0)
+        codes = matrix.codes[:, used]
+        self.names = [n for n, k in zip(matrix.names, used) if k]
+        self.tested = _pack(codes != NOT_TESTED)
+        self.resistant = _pack(codes == RESISTANT)
+        self.susceptible = _pack(codes == SUSCEPTIBLE)
+        # Antibiotype = profil identique (mêmes trois plans de bits).
+        self.antibiotype, self.counts = _row_groups(np.hstack([self.tested, self.resistant, self.susceptible]))
+        # Profil de résistance seul (quels antibiotiques sont R), pour repérer le fond.
+        pattern, counts = _row_groups(self.resistant)
+        self.pattern_counts = counts[pattern]
+
+    def __len__(self):
+        return len(self.antibiotype)
+
+    def distance(self, a, b):
+        # (antibiotiques discordants, antibiotiques testés pour les deux) des paires (a, b).
+        shared = self.tested[a] & self.tested[b]
+        diff = ((self.resistant[a] ^ self.resistant[b]) | (self.susceptible[a] ^ self.susceptible[b])) & shared
+        return _popcount(diff), _popcount(shared)
+
+    def resistant_to(self, rows):
+        # Libellé « R à ... » de chaque ligne demandée.
+        bits = np.unpackbits(self.resistant[rows].view(np.uint8), axis=1, bitorder="little")[:, :len(self.names)]
+        return [", ".join(n for n, bit in zip(self.names, row) if bit) or "-" for row in bits]
+
+
+def _window_pairs(group, day, window):
+    # Paires (i, j), i avant j, du même groupe à au plus window jours
+    # d'écart, produites par blocs d'environ PAIR_CHUNK paires.
+    if len(day) == 0:
+        return
+    order = np.lexsort((day, group))
+    key = group[order].astype(np.int64) * (int(day.max()) + window + 1) + day[order]
+    n = len(order)
+    end = np.searchsorted(key, key + window, side="right")
+    counts = end - np.arange(n) - 1
+    cum = np.cumsum(counts)
+    start = 0
+    while start < n:
+        done = cum[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(cum, done + PAIR_CHUNK, side="right")))
+        c = counts[start:stop]
+        first = np.repeat(np.arange(start, stop), c)
+        offset = np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)
+        yield order[first], order[first + 1 + offset]
+        start = stop
+
+
+def _components(n, a, b):
+    # Étiquette de composante connexe (plus petit indice) par propagation
+    # du minimum et saut de pointeurs.
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, a, low)
+        np.minimum.at(new, b, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def antibiotype_counts(fingerprints):
+    # Une ligne par antibiotype : isolats et antibiotiques résistants.
+    first = np.unique(fingerprints.antibiotype, return_index=True)[1]
+    out = pd.DataFrame({
+        "Antibiotype": np.arange(len(fingerprints.counts)),
+        "Isolats": fingerprints.counts,
+        "Résistant à": fingerprints.resistant_to(first),
+    })
+    return out.sort_values("Isolats", ascending=False, ignore_index=True)
+
+
+@timed("antibiotype_clusters")
+def find_clusters(meta, matrix, max_distance=MAX_DISTANCE, window_days=WINDOW_DAYS,
+                  min_shared=MIN_SHARED, min_patients=MIN_PATIENTS, common_share=COMMON_SHARE):
+    # Retourne (clusters, membres) : une ligne par cluster suspect, et
+    # l'étiquette d'isolat (index de meta) -> numéro de cluster.
+    dates = pd.to_datetime(meta[DATE_COLUMN], errors="coerce")
+    meta, dates = meta[dates.notna()], dates[dates.notna()]
+    matrix = matrix.align(meta.index)
+    fingerprints = Fingerprints(matrix)
+    day = (dates - dates.min()).dt.days.to_numpy()
+    wards = CategoryIndex(meta[WARD_COLUMN])
+    patient = pd.factorize(meta[PATIENT_COLUMN])[0]
+
+    eligible = np.flatnonzero(fingerprints.pattern_counts <= common_share * len(fingerprints))
+    edges_a, edges_b = [], []
+    for a, b in _window_pairs(wards.codes[eligible], day[eligible], window_days):
+        a, b = eligible[a], eligible[b]
+        # Même patient : prélèvements répétés, pas une transmission.
+        other = (patient[a] != patient[b]) | (patient[a] < 0)
+        a, b = a[other], b[other]
+        discordant, shared = fingerprints.distance(a, b)
+        close = (discordant <= max_distance) & (shared >= min_shared)
+        edges_a.append(a[close])
+        edges_b.append(b[close])
+    a = np.concatenate(edges_a) if edges_a else np.empty(0, dtype=np.int64)
+    b = np.concatenate(edges_b) if edges_b else np.empty(0, dtype=np.int64)
+
+    labels = _components(len(meta), a, b)
+    linked = np.unique(np.concatenate([a, b]))
+    members = pd.DataFrame({
+        "row": linked,
+        "label": labels[linked],
+        # Patient inconnu : compté comme un patient distinct.
+        "patient": np.where(patient[linked] < 0, -1 - linked, patient[linked]),
+        "date": dates.to_numpy()[linked],
+        "antibiotype": fingerprints.antibiotype[linked],
+        "phenotype": classify_phenotypes(matrix)[linked],
+    })
+    by_label = members.groupby("label")
+    summary = by_label.agg(
+        first=("row", "first"), start=("date", "min"), end=("date", "max"), isolates=("row", "size"),
+        patients=("patient", "nunique"), antibiotypes=("antibiotype", "nunique"),
+    )
+    summary = summary[summary["patients"] >= min_patients]
+    members = members[members["label"].isin(summary.index)]
+
+    # Antibiotype et phénotype majoritaires de chaque cluster.
+    main = members.groupby(["label", "antibiotype"])["row"].agg(["size", "first"]).sort_values("size", kind="stable")
+    main = main.groupby(level="label").tail(1).reset_index(level="antibiotype")["first"]
+    phenotype = members.groupby(["label", "phenotype"]).size().sort_values(kind="stable")
+    phenotype = phenotype.groupby(level="label").tail(1).reset_index(level="phenotype")["phenotype"]
+
+    clusters = pd.DataFrame({
+        "Service": np.array(wards.categories, dtype=object)[wards.codes[summary["first"].to_numpy()]],
+        "Début": summary["start"].to_numpy(),
+        "Fin": summary["end"].to_numpy(),
+        "Isolats": summary["isolates"].to_numpy(),
+        "Patients": summary["patients"].to_numpy(),
+        "Antibiotypes": summary["antibiotypes"].to_numpy(),
+        "Phénotype": np.array(PHENOTYPES, dtype=object)[phenotype.reindex(summary.index).to_numpy()],
+        "Résistant à": fingerprints.resistant_to(main.reindex(summary.index).to_numpy()),
+    }, index=summary.index)
+    clusters = clusters.sort_values(["Fin", "Isolats"], ascending=False)
+    number = pd.Series(np.arange(1, len(clusters) + 1), index=clusters.index)
+    clusters.insert(0, "Cluster", number.to_numpy())
+
+    # Étiquette d'isolat -> numéro de cluster (même numérotation que la table).
+    members = pd.Series(number.reindex(members["label"]).to_numpy(), index=meta.index[members["row"].to_numpy()],
+                        name="Cluster")
+    return clusters.reset_index(drop=True), members.sort_values(kind="stable")
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+import datasets
+from alerts import DEFAULT_WINDOW, RULES, alert_table, rate
+from cube import ALL_WARDS
+from dedup import WINDOWS
+from scan import ALPHA
+from watcher import fingerprint
+
+# Exécution sans interface des agrégats et alertes des tableaux de bord,
+# pour une tâche planifiée (cron). Aucun import de Streamlit, Plotly ni
+# matplotlib : seule la couche de données est chargée, et les chiffres
+# sortent des mêmes fonctions que celles des pages.
+# Si les sources n'ont pas changé depuis la dernière exécution, le
+# programme s'arrête avant de lire la moindre donnée.
+MANIFEST = "manifest.json"
+DEFAULT_OUTPUT = "batch_output"
+
+
+def _read_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(df, output, name, formats):
+    for fmt in formats:
+        path = os.path.join(output, f"{name}.{fmt}")
+        tmp = path + ".tmp"
+        if fmt == "csv":
+            df.to_csv(tmp, index=False)
+        else:
+            df.to_json(tmp, orient="records", date_format="iso", force_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+def run(output=DEFAULT_OUTPUT, formats=("json", "csv"), dedup=None, ward=None, nature=None,
+        start=None, end=None, window=DEFAULT_WINDOW):
+    # Calcule tout et écrit les fichiers ; retourne le résumé.
+    os.makedirs(output, exist_ok=True)
+    cube = datasets.load_cube(dedup)
+    first = cube.position[start] if start else 0
+    last = cube.position[end] if end else len(cube.labels) - 1
+
+    # Phénotypes et alertes MRSA / VRSA (mêmes lectures du cube que les pages)
+    weekly = cube.frame(first, last, ward, nature)
+    _write(weekly, output, "weekly_phenotypes", formats)
+    phenotype_alerts = cube.alerts(first, last, ward, nature)
+
+    # %R par antibiotique x service (page « Résistance hebdomadaire »)
+    series, weeks, tested, resistant = datasets.load_resistance_series(dedup)
+    resistance_alerts = alert_table(rate(resistant, tested), series, weeks, window, tested=tested)
+    resistance_alerts = resistance_alerts[
+        (resistance_alerts["Période"] >= cube.dates[first]) & (resistance_alerts["Période"] <= cube.dates[last])
+    ]
+    if ward is not None:
+        resistance_alerts = resistance_alerts[resistance_alerts["Service"].isin([ward, ALL_WARDS])]
+    _write(resistance_alerts, output, "resistance_alerts", formats)
+
+    # Règle de Tukey sur le classeur mensuel (dashboard_weekly_final_fixed)
+    percent_r = datasets.load_atb_percent_r_wide()
+    tukey = alert_table(percent_r.to_numpy(), percent_r.index.to_frame(index=False), percent_r.columns)
+    tukey = tukey[tukey["Règle"] == RULES["tukey"]]
+    _write(tukey, output, "atb_tukey_alerts", formats)
+
+    # Antibiogramme cumulé annuel par service (n < 30 non publié)
+    _write(datasets.load_antibiogram("year", "ward", dedup), output, "antibiogram", formats)
+
+    # Clusters suspects (antibiotypes proches, même service, même fenêtre)
+    clusters = datasets.load_antibiotype_clusters()[0]
+    clusters = clusters[(clusters["Fin"] >= cube.dates[first]) & (clusters["Début"] < cube.dates[last] + pd.Timedelta(days=7))]
+    if ward is not None:
+        clusters = clusters[clusters["Service"] == ward]
+    _write(clusters, output, "antibiotype_clusters", formats)
+    _write(datasets.load_antibiotypes(), output, "antibiotypes", formats)
+
+    # Scan spatio-temporel MRSA service x semaine (clusters p <= ALPHA)
+    scan = datasets.load_space_time_scan(first, last, "MRSA", nature, dedup)
+    scan = scan[scan["p"] <= ALPHA]
+    if ward is not None:
+        scan = scan[scan["Service"] == ward]
+    _write(scan, output, "space_time_scan", formats)
+
+    # Surveillance CUSUM / EWMA
+    surveillance = datasets.load_surveillance()
+    signals = surveillance.table()
+    _write(signals, output, "surveillance", formats)
+
+    summary = {
+        "weeks": [cube.labels[first], cube.labels[last]],
+        "dedup": dedup,
+        "ward": ward,
+        "nature": nature,
+        "isolates": int(weekly["Total"].sum()),
+        "mrsa_threshold": phenotype_alerts["mrsa_threshold"],
+        "mrsa_weeks_above": phenotype_alerts["mrsa_weeks_above"],
+        "vrsa_cases": phenotype_alerts["vrsa_cases"],
+        "resistance_alerts": int(len(resistance_alerts)),
+        "atb_tukey_alerts": sorted(tukey["Antibiotic"].unique().tolist()),
+        "antibiotype_clusters": int(len(clusters)),
+        "space_time_clusters": scan["Service"].tolist(),
+        "surveillance_week": None if surveillance.week is None else surveillance.week.date().isoformat(),
+        "surveillance_signals": signals.loc[signals["Signal"], "Série"].tolist(),
+    }
+    with open(os.path.join(output, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+# Clés du résumé qui déclenchent --fail-on-alert dès qu'elles sont non nulles
+# ou non vides : toutes les alertes écrites par run().
+ALERT_KEYS = [
+    "mrsa_weeks_above", "vrsa_cases", "resistance_alerts", "atb_tukey_alerts",
+    "antibiotype_clusters", "space_time_clusters", "surveillance_signals",
+]
+
+
+def _alerting(summary):
+    return any(summary.get(key) for key in ALERT_KEYS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agrégats et alertes des tableaux de bord, sans interface")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Répertoire des résultats")
+    parser.add_argument("--format", choices=["json", "csv", "both"], default="both")
+    parser.add_argument("--dedup", choices=list(WINDOWS), help="Premier isolat par patient (défaut : tous les isolats)")
+    parser.add_argument("--ward", help="Service (LIBELLE_DEMANDEUR)")
+    parser.add_argument("--nature", help="Nature de prélèvement")
+    parser.add_argument("--start", help="Première semaine, ex. 2024-S01")
+    parser.add_argument("--end", help="Dernière semaine, ex. 2024-S52")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="Semaines de référence des alertes %%R (0 : tout l'historique)")
+    parser.add_argument("--force", action="store_true", help="Recalculer même si les sources n'ont pas changé")
+    parser.add_argument("--fail-on-alert", action="store_true", help="Code de sortie 2 en cas d'alerte (MRSA, VRSA, %%R, Tukey, "
+                             "clusters, scan spatio-temporel, CUSUM / EWMA)")
+    args = parser.parse_args()
+
+    options = {key: getattr(args, key) for key in ("format", "dedup", "ward", "nature", "start", "end", "window")}
+    sources = fingerprint()
+    manifest = _read_manifest(args.output)
+    if not args.force and manifest and manifest["sources"] == sources and manifest["options"] == options:
+        print("Sources inchangées : rien à recalculer")
+        summary = manifest["summary"]
+    else:
+        cube = datasets.load_cube(args.dedup)
+        unknown = [label for label in (args.start, args.end) if label and label not in cube.position]
+        if unknown:
+            parser.error(f"semaine inconnue : {', '.join(unknown)} (de {cube.labels[0]} à {cube.labels[-1]})")
+        if args.ward and args.ward not in cube.wards:
+            parser.error(f"service inconnu : {args.ward}")
+        if args.nature and args.nature not in cube.natures:
+            parser.error(f"nature de prélèvement inconnue : {args.nature}")
+        formats = ("json", "csv") if args.format == "both" else (args.format,)
+        summary = run(args.output, formats, args.dedup, args.ward, args.nature, args.start, args.end, args.window or None)
+        with open(os.path.join(args.output, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"sources": sources, "options": options, "summary": summary}, f, indent=2, ensure_ascii=False)
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    sys.exit(2 if args.fail_on_alert and _alerting(summary) else 0)
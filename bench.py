@@ -0,0 +1,219 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+from alerts import DEFAULT_WINDOW, alert_table, rate
+from category_index import grouped_arrays
+from cube import WeeklyCube
+from figures import cases_figure, resistance_figure
+from isolates import SOURCE_FILE, add_iso_week
+from phenotypes import PHENOTYPES, weekly_phenotypes
+from resistance import resistance_series, weekly_resistance
+from sir_matrix import split_isolates
+from synthetic import synthetic_isolates, write_export
+
+# Banc de mesure des étapes des tableaux de bord sur des exports
+# synthétiques (synthetic.py) de taille croissante : lecture Excel, semaines
+# ISO, matrice S/I/R, agrégats par phénotype, %R, alertes, figures. Pour
+# chaque étape : meilleur temps sur --repeat exécutions, pic mémoire
+# (tracemalloc, dans une exécution séparée pour ne pas fausser le temps),
+# lignes en entrée et en sortie. Les résultats sont écrits en JSON avec les
+# versions des bibliothèques et le commit ; --compare signale les étapes
+# plus lentes qu'une exécution précédente.
+BASE_ROWS = 6222
+DEFAULT_OUTPUT = "bench_results"
+EXCEL_MAX_ROWS = 100_000
+TOLERANCE = 1.25
+
+
+def _excel_load(ctx):
+    ctx["raw"] = pd.read_excel(ctx["path"], sheet_name="Sheet1")
+    return None, len(ctx["raw"])
+
+
+def _iso_week(ctx):
+    out = add_iso_week(ctx["raw"])
+    return len(ctx["raw"]), len(out)
+
+
+def _sir_matrix(ctx):
+    ctx["meta"], ctx["matrix"] = split_isolates(ctx["raw"])
+    return len(ctx["raw"]), len(ctx["matrix"])
+
+
+def _phenotypes(ctx):
+    out = weekly_phenotypes(ctx["meta"], ctx["matrix"])
+    return len(ctx["meta"]), len(out)
+
+
+def _cube(ctx):
+    ctx["cube"] = WeeklyCube(ctx["meta"], ctx["matrix"])
+    return len(ctx["meta"]), int(ctx["cube"].counts.size)
+
+
+def _resistance_melt(ctx):
+    ctx["resistance"] = weekly_resistance(ctx["meta"], ctx["matrix"])
+    return len(ctx["meta"]), len(ctx["resistance"])
+
+
+def _resistance_series(ctx):
+    ctx["series"] = resistance_series(ctx["meta"], ctx["matrix"])
+    return len(ctx["meta"]), len(ctx["series"][0])
+
+
+def _alerts(ctx):
+    series, weeks, tested, resistant = ctx["series"]
+    out = alert_table(rate(resistant, tested), series, weeks, DEFAULT_WINDOW, tested=tested)
+    cube = ctx["cube"]
+    for ward in [None] + cube.wards:
+        cube.alerts(0, len(cube.labels) - 1, ward)
+    return int(tested.size), len(out)
+
+
+def _figures(ctx):
+    # Construction et sérialisation JSON (ce que Streamlit envoie au navigateur).
+    cube = ctx["cube"]
+    groups = grouped_arrays(ctx["resistance"], "Antibiotic", ["Date", "Week", "% Resistance"])
+    figures = [cases_figure(cube.frame(0, len(cube.labels) - 1), PHENOTYPES), resistance_figure(groups, list(groups))]
+    size = sum(len(pio.to_json(fig, validate=False)) for fig in figures)
+    return len(ctx["resistance"]), size
+
+
+STAGES = {
+    "excel_load": _excel_load,
+    "iso_week": _iso_week,
+    "sir_matrix": _sir_matrix,
+    "phenotypes": _phenotypes,
+    "cube": _cube,
+    "resistance_melt": _resistance_melt,
+    "resistance_series": _resistance_series,
+    "alerts": _alerts,
+    "figures": _figures,
+}
+
+
+def _measure(stage, ctx, repeat, memory):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows_in, rows_out = stage(ctx)
+        times.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        stage(ctx)
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return {"seconds": min(times), "peak_mb": peak, "rows_in": rows_in, "rows_out": rows_out}
+
+
+def _export(output, rows, years, seed):
+    # Les exports synthétiques sont conservés : les générer coûte plus cher que les lire.
+    path = os.path.join(output, "data", f"isolates-{rows}-{years}y-{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_export(synthetic_isolates(rows, years, seed), path + ".tmp.xlsx")
+        os.replace(path + ".tmp.xlsx", path)
+    return path
+
+
+def run(scales=(1, 10), years=1, seed=0, repeat=3, memory=True, output=DEFAULT_OUTPUT,
+        excel_max_rows=EXCEL_MAX_ROWS, stages=None):
+    results = []
+    for scale in scales:
+        rows = int(round(BASE_ROWS * scale))
+        ctx = {}
+        if rows <= excel_max_rows:
+            ctx["path"] = _export(output, rows, years, seed)
+        else:
+            ctx["raw"] = synthetic_isolates(rows, years, seed)
+        for name, stage in STAGES.items():
+            # excel_load alimente les étapes suivantes : toujours exécutée si possible.
+            if name == "excel_load" and "path" not in ctx:
+                results.append({"rows": rows, "stage": name, "skipped": f"plus de {excel_max_rows} lignes"})
+                continue
+            # Les étapes non demandées tournent une fois, pour leurs sorties.
+            selected = stages is None or name in stages
+            measure = _measure(stage, ctx, repeat if selected else 1, memory and selected)
+            if selected:
+                results.append({"rows": rows, "stage": name, **measure})
+                print(f"{rows:>9} {name:<18} {measure['seconds']:8.3f} s"
+                      + ("" if measure["peak_mb"] is None else f" {measure['peak_mb']:9.1f} Mo"), file=sys.stderr)
+        del ctx
+        gc.collect()
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous, tolerance=TOLERANCE):
+    # Étapes plus lentes que la référence au-delà de la tolérance.
+    before = {(r["rows"], r["stage"]): r["seconds"] for r in previous["results"] if "seconds" in r}
+    slower = []
+    for r in results:
+        reference = before.get((r["rows"], r["stage"]))
+        if reference and "seconds" in r and r["seconds"] > reference * tolerance:
+            slower.append({"rows": r["rows"], "stage": r["stage"], "before": reference,
+                           "after": r["seconds"], "ratio": r["seconds"] / reference})
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc de mesure des étapes sur des exports synthétiques")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10],
+                        help=f"Tailles en multiples de l'export actuel ({BASE_ROWS} isolats)")
+    parser.add_argument("--years", type=int, default=1, help="Années couvertes par les données synthétiques")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Exécutions par étape (meilleur temps retenu)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="Étapes à mesurer (défaut : toutes)")
+    parser.add_argument("--no-memory", action="store_true", help="Ne pas mesurer le pic mémoire")
+    parser.add_argument("--excel-max-rows", type=int, default=EXCEL_MAX_ROWS,
+                        help="Au-delà, pas d'export Excel : les étapes partent du DataFrame généré")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Répertoire des résultats et des exports générés")
+    parser.add_argument("--compare", help="Résultats JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Ratio de temps toléré avec --compare")
+    args = parser.parse_args()
+
+    results = run(args.scales, args.years, args.seed, args.repeat, not args.no_memory, args.output,
+                  args.excel_max_rows, args.stages)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "source": SOURCE_FILE,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": {"pandas": pd.__version__, "numpy": np.__version__, "plotly": plotly.__version__},
+        "options": {key: getattr(args, key) for key in ("scales", "years", "seed", "repeat", "stages")},
+        "results": results,
+    }
+    path = os.path.join(args.output, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(path)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for s in slower:
+            print(f"Plus lent : {s['stage']} ({s['rows']} lignes) {s['before']:.3f} s -> {s['after']:.3f} s "
+                  f"(x{s['ratio']:.2f})")
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# Index catégoriel : codes entiers par ligne et, pour chaque catégorie, la
+# liste triée des lignes correspondantes (un seul argsort à la construction).
+# Sélectionner un service revient à découper ce tableau, sans parcourir
+# toutes les lignes avec un masque booléen.
+UNKNOWN = "(non renseigné)"
+
+
+class CategoryIndex:
+    def __init__(self, values):
+        cat = pd.Categorical(pd.Series(values).fillna(UNKNOWN).astype(str))
+        self.categories = list(cat.categories)
+        self.codes = np.asarray(cat.codes)
+        self.order = np.argsort(self.codes, kind="stable")
+        counts = np.bincount(self.codes, minlength=len(self.categories))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.slot = {category: i for i, category in enumerate(self.categories)}
+        for array in (self.codes, self.order, self.offsets):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.categories)
+
+    def count(self, category):
+        i = self.slot[category]
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def rows(self, categories):
+        # Positions (croissantes) des lignes appartenant aux catégories demandées.
+        parts = [self.order[self.offsets[i]:self.offsets[i + 1]] for i in (self.slot[c] for c in categories)]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+
+def grouped_arrays(df, key, columns):
+    # {catégorie: {colonne: tableau}} : un seul tri stable à la construction,
+    # chaque groupe est ensuite une tranche contiguë (vue, sans copie).
+    index = CategoryIndex(df[key])
+    arrays = {col: df[col].to_numpy()[index.order] for col in columns}
+    return {
+        category: {col: array[index.offsets[i]:index.offsets[i + 1]] for col, array in arrays.items()}
+        for i, category in enumerate(index.categories)
+    }
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+from sir_matrix import NOT_TESTED, RESISTANT
+
+# Co-résistance entre antibiotiques : toutes les paires en trois produits
+# matriciels sur les indicatrices isolats x antibiotiques, sans boucle sur
+# les paires. Avec R (résistant) et T (testé) en 0/1 :
+#   R.T @ R  -> isolats résistants aux deux antibiotiques (diagonale : R) ;
+#   T.T @ T  -> isolats testés pour les deux (diagonale : tests) ;
+#   R.T @ T  -> isolats résistants à A et testés pour B, dénominateur de
+#               P(R à B | R à A).
+# Les produits se font en float32 : exacts tant que les effectifs restent
+# sous 2**24 isolats.
+MIN_PAIR_TESTS = 30
+
+
+class CoResistance:
+    def __init__(self, matrix, rows=None):
+        codes = matrix.codes if rows is None else matrix.codes[rows]
+        tested = codes != NOT_TESTED
+        # Seuls les antibiotiques testés au moins une fois dans la sélection.
+        keep = tested.any(axis=0)
+        self.columns = [c for c, k in zip(matrix.columns, keep) if k]
+        self.names = [n for n, k in zip(matrix.names, keep) if k]
+        self.isolates = len(codes)
+
+        t = tested[:, keep].astype(np.float32)
+        r = (codes[:, keep] == RESISTANT).astype(np.float32)
+        self.both_tested = np.rint(t.T @ t).astype(np.int64)
+        self.both_resistant = np.rint(r.T @ r).astype(np.int64)
+        self.resistant_tested = np.rint(r.T @ t).astype(np.int64)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def conditional(self, min_tests=MIN_PAIR_TESTS):
+        # [i, j] = P(R à j | R à i) en %, NaN sous min_tests isolats R à i testés pour j.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = self.both_resistant / self.resistant_tested * 100
+        out[self.resistant_tested < min_tests] = np.nan
+        return out
+
+    def co_rate(self, min_tests=MIN_PAIR_TESTS):
+        # [i, j] = % d'isolats résistants aux deux parmi ceux testés pour les deux.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = self.both_resistant / self.both_tested * 100
+        out[self.both_tested < min_tests] = np.nan
+        return out
+
+    def pairs(self, min_tests=MIN_PAIR_TESTS):
+        # Table longue des paires ordonnées (A, B), A != B, classée par P(R à B | R à A).
+        conditional = self.conditional(min_tests)
+        i, j = np.nonzero(~np.isnan(conditional) & ~np.eye(len(self), dtype=bool))
+        names = np.array(self.names, dtype=object)
+        out = pd.DataFrame({
+            "Antibiotique A": names[i],
+            "Antibiotique B": names[j],
+            "Testés (A et B)": self.both_tested[i, j],
+            "R à A, testés B": self.resistant_tested[i, j],
+            "R à A et B": self.both_resistant[i, j],
+            "P(R à B | R à A) (%)": conditional[i, j],
+            "% R aux deux": self.co_rate(1)[i, j],
+        })
+        return out.sort_values(["P(R à B | R à A) (%)", "R à A et B"], ascending=False, ignore_index=True)
+
+
+@timed("coresistance")
+def co_resistance(matrix, rows=None):
+    return CoResistance(matrix, rows)
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from category_index import CategoryIndex
+from isolates import DATE_COLUMN, add_iso_week
+from phenotypes import PHENOTYPES, classify_phenotypes
+
+# Cube de sommes cumulées semaine x phénotype x série, une série par
+# couple (service, nature de prélèvement) présent dans les données, plus
+# les marges « tous services » / « toutes natures ». Toute somme sur une
+# plage de semaines, prévalence, moyenne/écart-type ou nombre de semaines en
+# alerte se lit en temps constant par série : cum[fin + 1] - cum[début].
+# Les couples jamais observés ne sont pas stockés (ils pointent sur une
+# série nulle) : la mémoire est bornée par semaines x (phénotypes + 1) x
+# (services + natures + couples observés + 2), et non par le produit
+# services x natures, pour counts (int32) et ses trois tableaux cumulés.
+WARD_COLUMN = "LIBELLE_DEMANDEUR"
+NATURE_COLUMN = "NATURE"
+ALL_WARDS = "Tous les services"
+ALL_NATURES = "Toutes les natures"
+ALERT_SD = 2
+
+
+def _prefix(values):
+    cum = np.zeros((values.shape[0] + 1,) + values.shape[1:], dtype=np.float64 if values.dtype.kind == "f" else np.int64)
+    np.cumsum(values, axis=0, out=cum[1:])
+    cum.flags.writeable = False
+    return cum
+
+
+class WeeklyCube:
+    def __init__(self, meta, matrix):
+        meta = add_iso_week(meta)
+        codes = classify_phenotypes(matrix.align(meta.index))
+
+        # Semaines contiguës (lundis), semaines vides comprises.
+        dates = meta[DATE_COLUMN].dt.normalize()
+        mondays = dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+        first = mondays.min()
+        week_index = ((mondays - first).dt.days // 7).to_numpy()
+        self.dates = pd.date_range(first, mondays.max(), freq="7D")
+        iso = self.dates.isocalendar()
+        self.labels = [f"{y}-S{w:02d}" for y, w in zip(iso["year"], iso["week"])]
+        self.years = iso["year"].to_numpy()
+        self.weeks = iso["week"].to_numpy()
+        self.position = {label: i for i, label in enumerate(self.labels)}
+
+        # Index catégoriels : codes pour le cube, listes de lignes pour le détail.
+        self.ward_index = CategoryIndex(meta[WARD_COLUMN])
+        self.nature_index = CategoryIndex(meta[NATURE_COLUMN])
+        self.wards = self.ward_index.categories
+        self.natures = self.nature_index.categories
+        self.phenotypes = list(PHENOTYPES)
+
+        # Par isolat : étiquette de ligne, phénotype et semaine (pour le détail).
+        self.row_labels = meta.index
+        self.isolate_phenotypes = codes
+        self.isolate_weeks = week_index
+
+        # Chaque isolat compte dans quatre séries : (service, nature),
+        # (service, toutes), (tous, nature), (tous, toutes). slots[w, n] donne
+        # le numéro de série, le dernier indice de chaque axe valant « tous » ;
+        # la dernière série, jamais incrémentée, sert aux couples absents.
+        n_wards, n_natures = len(self.wards), len(self.natures)
+        w = self.ward_index.codes.astype(np.int64)
+        n = self.nature_index.codes.astype(np.int64)
+        keys = np.concatenate([w * (n_natures + 1) + n, w * (n_natures + 1) + n_natures,
+                               n_wards * (n_natures + 1) + n, np.full(len(w), n_wards * (n_natures + 1) + n_natures)])
+        present, series = np.unique(keys, return_inverse=True)
+        self.slots = np.full((n_wards + 1) * (n_natures + 1), len(present), dtype=np.int32)
+        self.slots[present] = np.arange(len(present))
+        self.slots = self.slots.reshape(n_wards + 1, n_natures + 1)
+
+        counts = np.zeros((len(self.dates), len(PHENOTYPES) + 1, len(present) + 1), dtype=np.int32)
+        np.add.at(counts, (np.tile(week_index, 4), np.tile(codes, 4), series.ravel()), 1)
+        # Total par phénotype.
+        counts[:, -1] = counts[:, :-1].sum(axis=1)
+        counts.flags.writeable = False
+        self.counts = counts
+
+        self.cum = _prefix(counts)
+        self.cum_sq = _prefix(counts.astype(np.float64) ** 2)
+
+        # Seuil moyenne + 2 SD par série, sur tout l'historique, puis
+        # indicatrice cumulée des semaines au-dessus du seuil.
+        n = len(self.dates)
+        mean = counts.mean(axis=0)
+        std = counts.std(axis=0, ddof=1) if n > 1 else np.zeros_like(mean)
+        self.thresholds = mean + ALERT_SD * std
+        self.cum_above = _prefix((counts > self.thresholds).astype(np.int32))
+
+    def _nature(self, nature):
+        return len(self.natures) if nature is None else self.nature_index.slot[nature]
+
+    def _slot(self, ward, nature):
+        w = len(self.wards) if ward is None else self.ward_index.slot[ward]
+        return self.slots[w, self._nature(nature)]
+
+    def range_counts(self, start, end, ward=None, nature=None):
+        # Effectifs par phénotype (+ "Total") entre les semaines start et end incluses.
+        slot = self._slot(ward, nature)
+        sums = self.cum[end + 1, :, slot] - self.cum[start, :, slot]
+        return dict(zip(self.phenotypes + ["Total"], sums.tolist()))
+
+    def range_prevalence(self, start, end, ward=None, nature=None):
+        counts = self.range_counts(start, end, ward, nature)
+        total = counts.pop("Total")
+        return {p: (c / total * 100 if total else np.nan) for p, c in counts.items()}
+
+    def range_mean_std(self, pheno, start, end, ward=None, nature=None):
+        slot = self._slot(ward, nature)
+        p = self.phenotypes.index(pheno) if pheno != "Total" else len(self.phenotypes)
+        k = end - start + 1
+        s1 = self.cum[end + 1, p, slot] - self.cum[start, p, slot]
+        s2 = self.cum_sq[end + 1, p, slot] - self.cum_sq[start, p, slot]
+        mean = s1 / k
+        std = np.sqrt(max(s2 - s1 * s1 / k, 0) / (k - 1)) if k > 1 else 0.0
+        return mean, std
+
+    def alerts(self, start, end, ward=None, nature=None):
+        slot = self._slot(ward, nature)
+        mrsa, vrsa = self.phenotypes.index("MRSA"), self.phenotypes.index("VRSA")
+        above = self.cum_above[end + 1, mrsa, slot] - self.cum_above[start, mrsa, slot]
+        return {
+            "mrsa_threshold": float(self.thresholds[mrsa, slot]),
+            "mrsa_weeks_above": int(above),
+            "vrsa_cases": int(self.cum[end + 1, vrsa, slot] - self.cum[start, vrsa, slot]),
+        }
+
+    def frame(self, start, end, ward=None, nature=None):
+        # Séries hebdomadaires de la plage, au format des tableaux de bord.
+        slot = self._slot(ward, nature)
+        block = self.counts[start:end + 1, :, slot]
+        df = pd.DataFrame(block, columns=self.phenotypes + ["Total"])
+        df.insert(0, "Année", self.years[start:end + 1])
+        df.insert(1, "Week", self.weeks[start:end + 1])
+        df.insert(2, "Date", self.dates[start:end + 1])
+        df.insert(3, "Semaine", self.labels[start:end + 1])
+        return df
+
+    def ward_breakdown(self, start, end, nature=None):
+        # Effectifs de la plage pour chaque service (une soustraction par cellule).
+        slots = self.slots[:-1, self._nature(nature)]
+        sums = self.cum[end + 1][:, slots] - self.cum[start][:, slots]
+        df = pd.DataFrame(sums.T, columns=self.phenotypes + ["Total"])
+        df.insert(0, "Service", self.wards)
+        df = df[df["Total"] > 0]
+        df["% MRSA"] = df["MRSA"] / df["Total"] * 100
+        return df.sort_values("Total", ascending=False, ignore_index=True)
+
+    def ward_weeks(self, start, end, pheno="Total", nature=None):
+        # Effectifs semaine x service de la plage (cellules du scan spatio-temporel).
+        p = self.phenotypes.index(pheno) if pheno != "Total" else len(self.phenotypes)
+        return self.counts[start:end + 1, p][:, self.slots[:-1, self._nature(nature)]]
+
+    def isolate_rows(self, start, end, ward=None, nature=None):
+        # Positions des isolats de la sélection : on rassemble les lignes du
+        # service / de la nature via l'index, puis on borne sur les semaines.
+        if ward is not None and nature is not None:
+            rows = np.intersect1d(self.ward_index.rows([ward]), self.nature_index.rows([nature]), assume_unique=True)
+        elif ward is not None:
+            rows = self.ward_index.rows([ward])
+        elif nature is not None:
+            rows = self.nature_index.rows([nature])
+        else:
+            rows = np.arange(len(self.row_labels))
+        weeks = self.isolate_weeks[rows]
+        return rows[(weeks >= start) & (weeks <= end)]
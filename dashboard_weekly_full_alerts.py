@@ -1,114 +1,131 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+
+from antibiotype import MAX_DISTANCE, WINDOW_DAYS
+from datasets import load_antibiotype_clusters, load_antibiotypes, load_cube, load_isolates, load_space_time_scan, load_surveillance
+from diagnostics import start_run
+from figure_cache import cached_figure
+from figures import cases_figure, prevalence_figure
+from scan import ALPHA, MAX_WEEKS, REPLICATES
+from views import DETAIL_COLUMNS, dedup_filter, diagnostics_panel, drilldown, plotly_chart, ward_nature_filters
+
+start_run("dashboard_weekly_full_alerts")
 
 st.set_page_config(layout="wide", page_title="Dashboard Hebdomadaire - Phénotypes")
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel("staph_aureus_phenotypes.xlsx", sheet_name="Sheet1")
-    valid_months = [
-        'January', 'February', 'March', 'April', 'May', 'June',
-        'July', 'August', 'September', 'October', 'November', 'December'
-    ]
-    df = df[df["Month"].isin(valid_months)].copy()
-    df["Date"] = pd.to_datetime(df["Month"] + " 2024", format="%B %Y")
-    df["Week"] = df["Date"].dt.isocalendar().week
-    return df
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
 
-df = load_data()
+cube = load_cube(dedup)
 
 st.title("📈 Dashboard Hebdomadaire - Phénotypes de Staphylococcus aureus")
 
 # Sidebar filters
 with st.sidebar:
-    st.header("Filtres")
-    selected_weeks = st.slider(
+    selected_weeks = st.select_slider(
         "Sélectionnez les semaines",
-        int(df["Week"].min()),
-        int(df["Week"].max()),
-        (int(df["Week"].min()), int(df["Week"].max()))
+        options=cube.labels,
+        value=(cube.labels[0], cube.labels[-1])
     )
     selected_pheno = st.multiselect(
         "Phénotypes à afficher",
         ["MRSA", "VRSA", "Wild", "others"],
         default=["MRSA", "VRSA", "Wild", "others"]
     )
+    selected_ward, selected_nature = ward_nature_filters(cube)
 
-df_filtered = df[(df["Week"] >= selected_weeks[0]) & (df["Week"] <= selected_weeks[1])]
-
-colors = {
-    "MRSA": "orange",
-    "VRSA": "red",
-    "Wild": "green",
-    "others": "blue"
-}
+# Lecture directe dans le cube précalculé (pas de re-filtrage des données)
+start, end = cube.position[selected_weeks[0]], cube.position[selected_weeks[1]]
+df_filtered = cube.frame(start, end, selected_ward, selected_nature)
+filters = (dedup, selected_weeks, selected_pheno, selected_ward, selected_nature)
 
 # Graphique interactif : Nombre de cas
 st.subheader("🧪 Nombre de cas par semaine (Interactif)")
-
-fig1 = go.Figure()
-for pheno in selected_pheno:
-    fig1.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=df_filtered[pheno],
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig1.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Nombre de cas",
-    title="Évolution hebdomadaire du nombre de cas par phénotype",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig1, use_container_width=True)
+fig1 = cached_figure("full_alerts.cases", filters, lambda: cases_figure(df_filtered, selected_pheno))
+plotly_chart(fig1)
 
 # Graphique interactif : Pourcentage
 st.subheader("📊 Prévalence (%) par semaine (Interactif)")
-
-fig2 = go.Figure()
-for pheno in selected_pheno:
-    fig2.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig2.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Prévalence (%)",
-    title="Évolution hebdomadaire des phénotypes en %",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig2, use_container_width=True)
+fig2 = cached_figure("full_alerts.prevalence", filters, lambda: prevalence_figure(df_filtered, selected_pheno))
+plotly_chart(fig2)
 
 
 # 🚨 ALERTES
 
 st.subheader("🚨 Alertes de surveillance")
 
-import numpy as np
+alerts = cube.alerts(start, end, selected_ward, selected_nature)
+mrsa_threshold = alerts["mrsa_threshold"]
+vrsa_cases_detected = alerts["vrsa_cases"]
 
-mean_mrsa = df["MRSA"].mean()
-std_mrsa = df["MRSA"].std()
-mrsa_threshold = mean_mrsa + 2 * std_mrsa
-vrsa_cases_detected = df_filtered["VRSA"].sum()
-
-if df_filtered["MRSA"].max() > mrsa_threshold:
+if alerts["mrsa_weeks_above"] > 0:
     st.warning(f"⚠️ ALERTE : Le nombre de cas MRSA dépasse la moyenne + 2 écarts-types ({mrsa_threshold:.1f})")
 
 if vrsa_cases_detected > 0:
     st.error(f"🚨 ALERTE : {vrsa_cases_detected} cas de VRSA détectés dans la période sélectionnée")
+
+# Surveillance en ligne (CUSUM / EWMA), mise à jour à chaque ingestion hebdomadaire
+surveillance = load_surveillance()
+if surveillance.week is not None:
+    st.markdown(f"### 📡 Surveillance CUSUM / EWMA (semaine du {surveillance.week:%d/%m/%Y})")
+    signals = surveillance.table()
+    for serie in signals.loc[signals["Signal"], "Série"]:
+        st.error(f"🚨 SIGNAL : rupture détectée sur « {serie} » la dernière semaine")
+    recent = signals[signals["Dernier signal"] >= surveillance.week - pd.Timedelta(weeks=4)]
+    if recent.empty:
+        st.success("Aucun signal CUSUM / EWMA sur les 4 dernières semaines.")
+    else:
+        st.dataframe(recent.sort_values("Dernier signal", ascending=False), use_container_width=True, hide_index=True)
+
+
+# 🧬 CLUSTERS SUSPECTS : isolats de patients différents, même service, profils
+# de résistance identiques ou presque, à quelques semaines d'intervalle
+
+st.subheader("🧬 Clusters suspects (antibiotypes proches)")
+col1, col2 = st.columns(2)
+with col1:
+    max_distance = st.slider("Antibiotiques discordants tolérés", 0, 3, MAX_DISTANCE)
+with col2:
+    window_days = st.select_slider("Écart maximal entre deux isolats (jours)", [7, 14, 28, 56], value=WINDOW_DAYS)
+clusters, members = load_antibiotype_clusters(max_distance, window_days)
+clusters = clusters[(clusters["Fin"] >= cube.dates[start]) & (clusters["Début"] < cube.dates[end] + pd.Timedelta(days=7))]
+if selected_ward is not None:
+    clusters = clusters[clusters["Service"] == selected_ward]
+if clusters.empty:
+    st.success("Aucun cluster suspect sur la période sélectionnée.")
+else:
+    st.dataframe(clusters, use_container_width=True, hide_index=True)
+    cluster = st.selectbox("Isolats du cluster", clusters["Cluster"])
+    meta = load_isolates()[0]
+    st.dataframe(meta.loc[members.index[members == cluster], DETAIL_COLUMNS], use_container_width=True, hide_index=True)
+with st.expander("Antibiotypes les plus fréquents (tous les isolats)"):
+    st.dataframe(load_antibiotypes().head(20), use_container_width=True, hide_index=True)
+
+# 🛰️ SCAN SPATIO-TEMPOREL : excès de cas concentré sur un service et
+# quelques semaines, au-delà de ce qu'expliquent sa taille et l'activité
+# globale de la période
+
+st.subheader("🛰️ Scan spatio-temporel (services x semaines)")
+col1, col2 = st.columns(2)
+with col1:
+    scan_pheno = st.selectbox("Phénotype scanné", ["MRSA", "VRSA", "Wild", "others", "Total"])
+with col2:
+    scan_weeks = st.slider("Durée maximale d'un cluster (semaines)", 1, 12, MAX_WEEKS)
+if st.checkbox(f"Lancer le scan ({REPLICATES} permutations Monte Carlo)"):
+    scan = load_space_time_scan(start, end, scan_pheno, selected_nature, dedup, scan_weeks)
+    flagged = scan[scan["p"] <= ALPHA]
+    if flagged.empty:
+        st.success(f"Aucun cluster spatio-temporel significatif (p ≤ {ALPHA}) sur la période sélectionnée.")
+    else:
+        st.warning(f"⚠️ {len(flagged)} cluster(s) spatio-temporel(s) significatif(s) (p ≤ {ALPHA})")
+        st.dataframe(flagged, use_container_width=True, hide_index=True)
+    with st.expander("Meilleur cylindre de chaque service"):
+        st.dataframe(scan, use_container_width=True, hide_index=True)
+
+# 🔎 DÉTAIL PAR SERVICE
+
+drilldown(cube, load_isolates()[0], start, end, selected_ward, selected_nature)
+
+diagnostics_panel()
@@ -3,40 +3,43 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from datasets import load_cube, load_daily_phenotypes
+from diagnostics import start_run
+from downsample import METHODS
+from figure_cache import cached_figure
+from figures import daily_figure
+from views import dedup_filter, diagnostics_panel, plotly_chart, ward_nature_filters
+
+start_run("dashboard_weekly_full_interactive")
+
 st.set_page_config(layout="wide", page_title="Dashboard Hebdomadaire - Phénotypes")
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel("staph_aureus_phenotypes.xlsx", sheet_name="Sheet1")
-    valid_months = [
-        'January', 'February', 'March', 'April', 'May', 'June',
-        'July', 'August', 'September', 'October', 'November', 'December'
-    ]
-    df = df[df["Month"].isin(valid_months)].copy()
-    df["Date"] = pd.to_datetime(df["Month"] + " 2024", format="%B %Y")
-    df["Week"] = df["Date"].dt.isocalendar().week
-    return df
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
 
-df = load_data()
+cube = load_cube(dedup)
 
 st.title("📈 Dashboard Hebdomadaire - Phénotypes de Staphylococcus aureus")
 
 # Sidebar filters
 with st.sidebar:
-    st.header("Filtres")
-    selected_weeks = st.slider(
+    selected_weeks = st.select_slider(
         "Sélectionnez les semaines",
-        int(df["Week"].min()),
-        int(df["Week"].max()),
-        (int(df["Week"].min()), int(df["Week"].max()))
+        options=cube.labels,
+        value=(cube.labels[0], cube.labels[-1])
     )
     selected_pheno = st.multiselect(
         "Phénotypes à afficher",
         ["MRSA", "VRSA", "Wild", "others"],
         default=["MRSA", "VRSA", "Wild", "others"]
     )
+    selected_ward, selected_nature = ward_nature_filters(cube)
 
-df_filtered = df[(df["Week"] >= selected_weeks[0]) & (df["Week"] <= selected_weeks[1])]
+# Lecture directe dans le cube précalculé (pas de re-filtrage des données)
+start, end = cube.position[selected_weeks[0]], cube.position[selected_weeks[1]]
+df_filtered = cube.frame(start, end, selected_ward, selected_nature)
+filters = (dedup, selected_weeks, selected_pheno, selected_ward, selected_nature)
 
 colors = {
     "MRSA": "orange",
@@ -48,49 +51,77 @@ colors = {
 # Graphique interactif : Nombre de cas
 st.subheader("🧪 Nombre de cas par semaine (Interactif)")
 
-fig1 = go.Figure()
-for pheno in selected_pheno:
-    fig1.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=df_filtered[pheno],
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig1.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Nombre de cas",
-    title="Évolution hebdomadaire du nombre de cas par phénotype",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig1, use_container_width=True)
+def build_cases():
+    fig1 = go.Figure()
+    for pheno in selected_pheno:
+        fig1.add_trace(go.Scatter(
+            x=df_filtered["Semaine"],
+            y=df_filtered[pheno],
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
+            line_color=colors[pheno]
+        ))
+
+    fig1.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Nombre de cas",
+        title="Évolution hebdomadaire du nombre de cas par phénotype",
+        hovermode="x unified",
+        height=500
+    )
+    return fig1
+
+plotly_chart(cached_figure("full_interactive.cases", filters, build_cases))
 
 # Graphique interactif : Pourcentage
 st.subheader("📊 Prévalence (%) par semaine (Interactif)")
 
-fig2 = go.Figure()
-for pheno in selected_pheno:
-    fig2.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig2.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Prévalence (%)",
-    title="Évolution hebdomadaire des phénotypes en %",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig2, use_container_width=True)
+def build_prevalence():
+    fig2 = go.Figure()
+    for pheno in selected_pheno:
+        fig2.add_trace(go.Scatter(
+            x=df_filtered["Semaine"],
+            y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
+            line_color=colors[pheno]
+        ))
+
+    fig2.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Prévalence (%)",
+        title="Évolution hebdomadaire des phénotypes en %",
+        hovermode="x unified",
+        height=500
+    )
+    return fig2
+
+plotly_chart(cached_figure("full_interactive.prevalence", filters, build_prevalence))
+
+# Vue quotidienne : chaque série est réduite côté serveur à la largeur du
+# graphique ; restreindre la plage recalcule la réduction sur cette plage,
+# jusqu'à la résolution journalière complète.
+st.subheader("📅 Nombre de cas par jour (tous services)")
+
+daily = load_daily_phenotypes(dedup)
+first_day, last_day = daily["Date"].iloc[0].date(), daily["Date"].iloc[-1].date()
+col1, col2 = st.columns([3, 1])
+with col1:
+    day_range = st.slider("Plage affichée", min_value=first_day, max_value=last_day,
+                          value=(first_day, last_day), format="DD/MM/YYYY")
+with col2:
+    method = st.selectbox("Réduction", list(METHODS), format_func=METHODS.get)
+
+def build_daily():
+    shown = daily[(daily["Date"] >= pd.Timestamp(day_range[0])) & (daily["Date"] <= pd.Timestamp(day_range[1]))]
+    return daily_figure(shown, selected_pheno, method=method)
+
+plotly_chart(cached_figure("full_interactive.daily", (dedup, day_range, selected_pheno, method), build_daily))
+
+diagnostics_panel()
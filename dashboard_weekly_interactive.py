@@ -1,43 +1,43 @@
 
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 
+from datasets import load_cube
+from diagnostics import start_run
+from figure_cache import cached_figure
+from views import dedup_filter, diagnostics_panel, plotly_chart, ward_nature_filters
+
+start_run("dashboard_weekly_interactive")
+
 st.set_page_config(layout="wide", page_title="Dashboard Hebdomadaire - Phénotypes")
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel("staph_aureus_phenotypes.xlsx", sheet_name="Sheet1")
-    valid_months = [
-        'January', 'February', 'March', 'April', 'May', 'June',
-        'July', 'August', 'September', 'October', 'November', 'December'
-    ]
-    df = df[df["Month"].isin(valid_months)].copy()
-    df["Date"] = pd.to_datetime(df["Month"] + " 2024", format="%B %Y")
-    df["Week"] = df["Date"].dt.isocalendar().week
-    return df
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
 
-df = load_data()
+cube = load_cube(dedup)
 
 st.title("📈 Dashboard Hebdomadaire - Phénotypes de Staphylococcus aureus")
 
 # Sidebar filters
 with st.sidebar:
-    st.header("Filtres")
-    selected_weeks = st.slider(
+    selected_weeks = st.select_slider(
         "Sélectionnez les semaines",
-        int(df["Week"].min()),
-        int(df["Week"].max()),
-        (int(df["Week"].min()), int(df["Week"].max()))
+        options=cube.labels,
+        value=(cube.labels[0], cube.labels[-1])
     )
     selected_pheno = st.multiselect(
         "Phénotypes à afficher",
         ["MRSA", "VRSA", "Wild", "others"],
         default=["MRSA", "VRSA", "Wild", "others"]
     )
+    selected_ward, selected_nature = ward_nature_filters(cube)
 
 # Filtrage
-df_filtered = df[(df["Week"] >= selected_weeks[0]) & (df["Week"] <= selected_weeks[1])]
+# Lecture directe dans le cube précalculé (pas de re-filtrage des données)
+start, end = cube.position[selected_weeks[0]], cube.position[selected_weeks[1]]
+df_filtered = cube.frame(start, end, selected_ward, selected_nature)
+filters = (dedup, selected_weeks, selected_pheno, selected_ward, selected_nature)
 
 colors = {
     "MRSA": "orange",
@@ -49,26 +49,30 @@ colors = {
 # Graphique interactif pour les pourcentages
 st.subheader("📊 Prévalence (%) par semaine (Interactif)")
 
-fig = go.Figure()
-
-for pheno in selected_pheno:
-    fig.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Prévalence (%)",
-    title="Évolution hebdomadaire des phénotypes en %",
-    hovermode="x unified",
-    height=500
-)
-
-st.plotly_chart(fig, use_container_width=True)
+def build_prevalence():
+    fig = go.Figure()
+
+    for pheno in selected_pheno:
+        fig.add_trace(go.Scatter(
+            x=df_filtered["Semaine"],
+            y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
+            line_color=colors[pheno]
+        ))
+
+    fig.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Prévalence (%)",
+        title="Évolution hebdomadaire des phénotypes en %",
+        hovermode="x unified",
+        height=500
+    )
+    return fig
+
+plotly_chart(cached_figure("interactive.prevalence", filters, build_prevalence))
+
+diagnostics_panel()
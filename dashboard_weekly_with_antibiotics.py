@@ -3,40 +3,41 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from datasets import load_atb_flat, load_cube
+from diagnostics import start_run
+from figure_cache import cached_figure
+from views import dedup_filter, diagnostics_panel, plotly_chart, ward_nature_filters
+
+start_run("dashboard_weekly_with_antibiotics")
+
 st.set_page_config(layout="wide", page_title="Dashboard Hebdomadaire - Phénotypes")
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel("staph_aureus_phenotypes.xlsx", sheet_name="Sheet1")
-    valid_months = [
-        'January', 'February', 'March', 'April', 'May', 'June',
-        'July', 'August', 'September', 'October', 'November', 'December'
-    ]
-    df = df[df["Month"].isin(valid_months)].copy()
-    df["Date"] = pd.to_datetime(df["Month"] + " 2024", format="%B %Y")
-    df["Week"] = df["Date"].dt.isocalendar().week
-    return df
+with st.sidebar:
+    st.header("Filtres")
+    dedup = dedup_filter()
 
-df = load_data()
+cube = load_cube(dedup)
 
 st.title("📈 Dashboard Hebdomadaire - Phénotypes de Staphylococcus aureus")
 
 # Sidebar filters
 with st.sidebar:
-    st.header("Filtres")
-    selected_weeks = st.slider(
+    selected_weeks = st.select_slider(
         "Sélectionnez les semaines",
-        int(df["Week"].min()),
-        int(df["Week"].max()),
-        (int(df["Week"].min()), int(df["Week"].max()))
+        options=cube.labels,
+        value=(cube.labels[0], cube.labels[-1])
     )
     selected_pheno = st.multiselect(
         "Phénotypes à afficher",
         ["MRSA", "VRSA", "Wild", "others"],
         default=["MRSA", "VRSA", "Wild", "others"]
     )
+    selected_ward, selected_nature = ward_nature_filters(cube)
 
-df_filtered = df[(df["Week"] >= selected_weeks[0]) & (df["Week"] <= selected_weeks[1])]
+# Lecture directe dans le cube précalculé (pas de re-filtrage des données)
+start, end = cube.position[selected_weeks[0]], cube.position[selected_weeks[1]]
+df_filtered = cube.frame(start, end, selected_ward, selected_nature)
+filters = (dedup, selected_weeks, selected_pheno, selected_ward, selected_nature)
 
 colors = {
     "MRSA": "orange",
@@ -48,66 +49,69 @@ colors = {
 # Graphique interactif : Nombre de cas
 st.subheader("🧪 Nombre de cas par semaine (Interactif)")
 
-fig1 = go.Figure()
-for pheno in selected_pheno:
-    fig1.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=df_filtered[pheno],
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig1.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Nombre de cas",
-    title="Évolution hebdomadaire du nombre de cas par phénotype",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig1, use_container_width=True)
+def build_cases():
+    fig1 = go.Figure()
+    for pheno in selected_pheno:
+        fig1.add_trace(go.Scatter(
+            x=df_filtered["Semaine"],
+            y=df_filtered[pheno],
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
+            line_color=colors[pheno]
+        ))
+
+    fig1.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Nombre de cas",
+        title="Évolution hebdomadaire du nombre de cas par phénotype",
+        hovermode="x unified",
+        height=500
+    )
+    return fig1
+
+plotly_chart(cached_figure("with_antibiotics.cases", filters, build_cases))
 
 # Graphique interactif : Pourcentage
 st.subheader("📊 Prévalence (%) par semaine (Interactif)")
 
-fig2 = go.Figure()
-for pheno in selected_pheno:
-    fig2.add_trace(go.Scatter(
-        x=df_filtered["Week"],
-        y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
-        mode='lines+markers',
-        name=pheno,
-        marker=dict(size=8),
-        line=dict(width=3),
-        hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
-        line_color=colors[pheno]
-    ))
-
-fig2.update_layout(
-    xaxis_title="Semaine",
-    yaxis_title="Prévalence (%)",
-    title="Évolution hebdomadaire des phénotypes en %",
-    hovermode="x unified",
-    height=500
-)
-st.plotly_chart(fig2, use_container_width=True)
+def build_prevalence():
+    fig2 = go.Figure()
+    for pheno in selected_pheno:
+        fig2.add_trace(go.Scatter(
+            x=df_filtered["Semaine"],
+            y=(df_filtered[pheno] / df_filtered["Total"]) * 100,
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
+            line_color=colors[pheno]
+        ))
+
+    fig2.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Prévalence (%)",
+        title="Évolution hebdomadaire des phénotypes en %",
+        hovermode="x unified",
+        height=500
+    )
+    return fig2
+
+plotly_chart(cached_figure("with_antibiotics.prevalence", filters, build_prevalence))
 
 
 # 🚨 ALERTES
 
 st.subheader("🚨 Alertes de surveillance")
 
-import numpy as np
+alerts = cube.alerts(start, end, selected_ward, selected_nature)
+mrsa_threshold = alerts["mrsa_threshold"]
+vrsa_cases_detected = alerts["vrsa_cases"]
 
-mean_mrsa = df["MRSA"].mean()
-std_mrsa = df["MRSA"].std()
-mrsa_threshold = mean_mrsa + 2 * std_mrsa
-vrsa_cases_detected = df_filtered["VRSA"].sum()
-
-if df_filtered["MRSA"].max() > mrsa_threshold:
+if alerts["mrsa_weeks_above"] > 0:
     st.warning(f"⚠️ ALERTE : Le nombre de cas MRSA dépasse la moyenne + 2 écarts-types ({mrsa_threshold:.1f})")
 
 if vrsa_cases_detected > 0:
@@ -117,15 +121,8 @@ if vrsa_cases_detected > 0:
 # Onglet : Autres antibiotiques
 st.subheader("🧬 Autres antibiotiques")
 
-# Charger les données brutes (même fichier utilisé dans l'analyse précédente)
-@st.cache_data
-def load_atb_data():
-    df_atb = pd.read_excel("staph aureus autre atb.xlsx", header=[0, 1])
-    df_atb.columns = [f"{col[0]} - {col[1]}" if not pd.isna(col[1]) else col[0] for col in df_atb.columns]
-    df_atb.rename(columns={df_atb.columns[0]: "Month"}, inplace=True)
-    return df_atb
-
-df_atb_raw = load_atb_data()
+# Données brutes (même fichier utilisé dans l'analyse précédente)
+df_atb_raw = load_atb_flat()
 
 st.markdown("### 📋 Tableau brut des antibiotiques")
 st.dataframe(df_atb_raw, use_container_width=True)
@@ -137,3 +134,5 @@ df_long["Antibiotic"] = df_long["Antibiotic"].str.extract(r'([A-Za-zé]+)', expa
 
 st.markdown("### 📊 Résistance (%R) par antibiotique")
 st.dataframe(df_long.dropna(), use_container_width=True)
+
+diagnostics_panel()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from diagnostics import annotate, stage, timed
+from xlsx_stream import read_xlsx_columns
+
+# Cache binaire des classeurs Excel, stocké à côté de chaque fichier source.
+# Le parse XML d'openpyxl coûte plusieurs secondes à chaque démarrage à froid ;
+# relire un Parquet (ou un pickle en repli) ne coûte que quelques millisecondes.
+CACHE_DIR_NAME = ".cache_xlsx"
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_base(path, loader, kwargs):
+    # Une entrée par (fichier, lecteur, options) : header=[0, 1], dtype=str ou
+    # une projection de colonnes ne donnent pas le même DataFrame.
+    options = json.dumps([loader.__name__, kwargs], sort_keys=True, default=str)
+    key = hashlib.sha1(options.encode("utf-8")).hexdigest()[:12]
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(directory, f"{os.path.basename(path)}.{key}")
+
+
+def _read_meta(base):
+    try:
+        with open(base + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(base, meta):
+    tmp = base + ".json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, base + ".json")
+
+
+def _load_frame(base, meta):
+    data_path = f"{base}.{meta['format']}"
+    if meta["format"] == "parquet":
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def _store_frame(base, df):
+    # Parquet quand Arrow sait représenter le tableau ; les classeurs saisis
+    # à la main (colonnes mêlant texte et nombres) repassent par pickle.
+    tmp = base + ".parquet.tmp"
+    try:
+        df.to_parquet(tmp)
+        os.replace(tmp, base + ".parquet")
+        return "parquet"
+    except (ImportError, ValueError, TypeError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    tmp = base + ".pkl.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, base + ".pkl")
+    return "pkl"
+
+
+def _cached(path, loader, kwargs):
+    stat = os.stat(path)
+    base = _cache_base(path, loader, kwargs)
+    meta = _read_meta(base)
+
+    # Chemin rapide : même taille et même mtime, aucune lecture du classeur.
+    if meta and meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        try:
+            df = _load_frame(base, meta)
+            annotate(cache="hit")
+            return df
+        except Exception:
+            meta = None
+
+    # Un redéploiement (git checkout, copie) change la mtime sans changer le
+    # contenu : on compare alors l'empreinte avant de reparser.
+    digest = _file_sha256(path)
+    if meta and meta["sha256"] == digest:
+        try:
+            df = _load_frame(base, meta)
+            meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _write_meta(base, meta)
+            annotate(cache="hit")
+            return df
+        except Exception:
+            pass
+
+    annotate(cache="miss")
+    with stage(f"parse {os.path.basename(path)}") as record:
+        df = loader(path, **kwargs)
+        record["rows_out"] = len(df)
+    try:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        fmt = _store_frame(base, df)
+        _write_meta(base, {
+            "source": os.path.basename(path),
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "format": fmt,
+        })
+    except OSError:
+        # Répertoire en lecture seule : on sert le DataFrame sans cache.
+        pass
+    return df
+
+
+@timed("read_excel")
+def read_excel_cached(path, **kwargs):
+    return _cached(path, pd.read_excel, kwargs)
+
+
+@timed("read_columns")
+def read_columns_cached(path, columns, **kwargs):
+    # Projection de colonnes (et prédicat de dates) via le lecteur en flux :
+    # seul ce sous-ensemble est parsé puis mis en cache.
+    return _cached(path, read_xlsx_columns, dict(kwargs, columns=list(columns)))
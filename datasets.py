@@ -0,0 +1,332 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from antibiogram import antibiogram
+from antibiotype import MAX_DISTANCE, WINDOW_DAYS, Fingerprints, antibiotype_counts, find_clusters
+from category_index import grouped_arrays
+from cube import WeeklyCube
+from data_cache import read_columns_cached, read_excel_cached
+from dedup import first_isolate_mask
+from diagnostics import rows, stage
+from ingest import STORE_DIR, has_store, load_aggregate, read_store, watermark
+from isolates import DATE_COLUMN, SOURCE_FILE
+from phenotypes import classify_phenotypes, daily_phenotypes, weekly_phenotypes
+from resistance import monthly_resistance, resistance_series, weekly_resistance
+from scan import MAX_WEEKS, space_time_scan
+from sir_matrix import split_isolates
+from surveillance import STATE_FILE, Surveillance
+from xlsx_stream import read_xlsx_header
+
+# Couche d'accès aux données partagée par toutes les pages.
+# Chaque jeu de données est chargé une seule fois par processus serveur puis
+# distribué à toutes les sessions sous forme de vues : pas de pickle ni de
+# copie à chaque appel comme avec @st.cache_data, la mémoire reste stable
+# quel que soit le nombre d'utilisateurs connectés.
+ATB_FILE = "staph_aureus_autre_atb.xlsx"
+# Profondeur (semaines) des isolats bruts lus dans le stock multi-années,
+# 0 pour tout l'historique : les vues au niveau isolat (cube, alertes,
+# détail) coûtent le même prix quelle que soit l'ancienneté du stock. Les
+# tendances hebdomadaires longues viennent des agrégats de l'ingestion.
+HISTORY_WEEKS = int(os.environ.get("DASHBOARD_HISTORY_WEEKS", 104))
+# Colonnes d'identification qu'aucune page n'utilise, jamais lues.
+UNUSED_COLUMNS = ["DATE_ENTREE", "DEMANDEUR", "CODE_GERME", "LIB_GERME"]
+
+# Les pages ne doivent pas modifier en place les vues reçues : le
+# copy-on-write, activé par views.py pour le serveur Streamlit (natif à
+# partir de pandas 3), leur donne alors leur propre copie.
+_lock = threading.RLock()
+_datasets = {}
+# Recette de chaque jeu de base déjà servi, pour le reconstruire à
+# l'identique lors d'un rafraîchissement (watcher.py). Ensemble borné : les
+# résultats qui dépendent de curseurs passent par _variant et n'y sont pas.
+_builders = {}
+# Cache de préparation du thread qui reconstruit (refresh), s'il y en a un.
+_building = threading.local()
+# Résultats qui dépendent de curseurs (clusters, scan...) : une entrée par
+# position visitée, donc un cache LRU borné à MAX_VARIANTS entrées plutôt
+# que le cache partagé, où elles resteraient indéfiniment.
+MAX_VARIANTS = 16
+_variants = OrderedDict()
+# Incrémenté à chaque rafraîchissement : les caches dérivés (figures...) l'incluent
+# dans leurs clés et ne servent jamais un résultat d'une génération passée.
+_generation = 0
+
+
+def _view(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_view(v) for v in value)
+    return value
+
+
+def _shared(name, build):
+    staging = getattr(_building, "datasets", None)
+    with stage(f"dataset {name}", cache="hit") as record:
+        if staging is not None:
+            # Reconstruction : propre au thread, sans verrou ni lecture du cache courant.
+            dataset = staging.get(name)
+            if dataset is None:
+                record["cache"] = "miss"
+                dataset = staging[name] = build()
+                _builders[name] = build
+        else:
+            dataset = _datasets.get(name)
+            if dataset is None:
+                with _lock:
+                    dataset = _datasets.get(name)
+                    if dataset is None:
+                        record["cache"] = "miss"
+                        dataset = build()
+                        _datasets[name] = dataset
+                        _builders[name] = build
+        record["rows_out"] = rows(dataset)
+    return _view(dataset)
+
+
+def refresh(warm=()):
+    # Reconstruit hors du cache courant les jeux de base déjà servis (puis
+    # les chargeurs de warm), et ne les substitue qu'une fois tous prêts :
+    # les pages lisent l'ancienne génération jusqu'à la bascule, jamais un
+    # cache vide. Les résultats de curseurs (_variants) ne sont pas
+    # recalculés : ils sont abandonnés à la bascule et refaits à la demande.
+    # Une exception laisse l'ancienne génération en place.
+    global _datasets, _generation
+    staging = {}
+    _building.datasets = staging
+    try:
+        for name, build in list(_builders.items()):
+            _shared(name, build)
+        for load in warm:
+            load()
+    finally:
+        del _building.datasets
+    with _lock:
+        _datasets = staging
+        _variants.clear()
+        _generation += 1
+
+
+def _variant(name, build):
+    # Calcul hors verrou : un résultat de plusieurs secondes ne bloque pas
+    # les autres chargements. La clé porte la génération : un résultat
+    # d'avant un rafraîchissement n'est jamais resservi.
+    with stage(f"dataset {name}", cache="hit") as record:
+        with _lock:
+            key = (_generation, name)
+            dataset = _variants.get(key)
+            if dataset is not None:
+                _variants.move_to_end(key)
+        if dataset is None:
+            record["cache"] = "miss"
+            dataset = build()
+            with _lock:
+                if _generation == key[0]:
+                    _variants[key] = dataset
+                    while len(_variants) > MAX_VARIANTS:
+                        _variants.popitem(last=False)
+        record["rows_out"] = rows(dataset)
+    return _view(dataset)
+
+
+def generation():
+    return _generation
+
+
+def _history_start(latest):
+    # Lundi de la première semaine servie (None : tout l'historique).
+    if not HISTORY_WEEKS or latest is None:
+        return None
+    start = (latest - pd.Timedelta(weeks=HISTORY_WEEKS)).normalize()
+    return start - pd.Timedelta(days=start.weekday())
+
+
+def _read_isolates():
+    # Historique multi-années du stock partitionné (ingest.py) s'il existe,
+    # sinon l'export brut unique.
+    if has_store(STORE_DIR):
+        start = _history_start(watermark(STORE_DIR))
+        return read_store(STORE_DIR, start=start, exclude=UNUSED_COLUMNS)
+    # Export unique : lecture en flux des seules colonnes utiles.
+    columns = [name for name in read_xlsx_header(SOURCE_FILE, "Sheet1") if name not in UNUSED_COLUMNS]
+    return read_columns_cached(SOURCE_FILE, columns, sheet_name="Sheet1", date_column=DATE_COLUMN)
+
+
+def _build_isolates():
+    meta, matrix = split_isolates(_read_isolates())
+    matrix.codes.flags.writeable = False
+    return meta, matrix
+
+
+def _readonly(arrays):
+    for array in arrays:
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    return arrays
+
+
+def _suffix(dedup):
+    return "" if dedup is None else f"_{dedup}"
+
+
+def _build_first_isolates(dedup):
+    meta, matrix = load_isolates()
+    phenotypes = classify_phenotypes(matrix) if dedup == "phenotype" else None
+    meta = meta[first_isolate_mask(meta, dedup, phenotypes)]
+    matrix = matrix.align(meta.index)
+    matrix.codes.flags.writeable = False
+    return meta, matrix
+
+
+def load_isolates(dedup=None):
+    # (colonnes d'identification, SIRMatrix en lecture seule)
+    # dedup : None (tous les isolats) ou une fenêtre de dedup.WINDOWS.
+    if dedup is None:
+        return _shared("isolates", _build_isolates)
+    return _shared("isolates" + _suffix(dedup), lambda: _build_first_isolates(dedup))
+
+
+def _weekly(name, build, dedup):
+    # Comptage brut avec un stock : agrégat hebdomadaire de l'ingestion, sur
+    # la même fenêtre que les isolats (les vues dédoublonnées en dépendent) ;
+    # sinon calcul sur les isolats.
+    if dedup is None and has_store(STORE_DIR):
+        latest = watermark(STORE_DIR)
+        start = _history_start(latest)
+        if start is None:
+            return load_aggregate(name, STORE_DIR)
+        first = start.isocalendar()
+        out = load_aggregate(name, STORE_DIR, years=(first.year, latest.isocalendar().year))
+        keep = (out["Année"] > first.year) | (out["Week"] >= first.week)
+        return out[keep].reset_index(drop=True)
+    return build(*load_isolates(dedup))
+
+
+def load_phenotypes(dedup=None):
+    return _shared("phenotypes" + _suffix(dedup), lambda: _weekly("weekly_phenotypes", weekly_phenotypes, dedup))
+
+
+def load_daily_phenotypes(dedup=None):
+    return _shared("daily_phenotypes" + _suffix(dedup), lambda: daily_phenotypes(*load_isolates(dedup)))
+
+
+def load_resistance(period="week", dedup=None):
+    if period == "week":
+        return _shared("resistance_week" + _suffix(dedup), lambda: _weekly("weekly_resistance", weekly_resistance, dedup))
+    return _shared("resistance_month" + _suffix(dedup), lambda: monthly_resistance(*load_isolates(dedup)))
+
+
+def load_resistance_groups(period="week", dedup=None):
+    # Séries %R prêtes à tracer : {antibiotique: {colonne: tableau}}
+    columns = ["Date", "Week", "% Resistance"] if period == "week" else ["Month", "% Resistance"]
+    return _shared(f"resistance_groups_{period}" + _suffix(dedup),
+                   lambda: grouped_arrays(load_resistance(period, dedup), "Antibiotic", columns))
+
+
+def load_antibiogram(period="year", by=None, dedup=None):
+    # Antibiogramme cumulé, un jeu partagé par (période, stratification).
+    return _shared(f"antibiogram_{period}_{by}" + _suffix(dedup),
+                   lambda: antibiogram(*load_isolates(dedup), period=period, by=by))
+
+
+def load_antibiotype_clusters(max_distance=MAX_DISTANCE, window_days=WINDOW_DAYS):
+    # (clusters, membres) sur tous les isolats : les paires d'un même patient
+    # sont déjà écartées par find_clusters.
+    return _variant(f"antibiotype_clusters_{max_distance}_{window_days}",
+                    lambda: find_clusters(*load_isolates(), max_distance=max_distance, window_days=window_days))
+
+
+def load_antibiotypes():
+    # Effectif de chaque antibiotype (profil S/I/R identique) sur tous les isolats.
+    return _shared("antibiotypes", lambda: antibiotype_counts(Fingerprints(load_isolates()[1])))
+
+
+def load_space_time_scan(start, end, phenotype="MRSA", nature=None, dedup=None, max_weeks=MAX_WEEKS):
+    # Scan service x semaine (permutation, Monte Carlo) sur les semaines
+    # start..end du cube ; phenotype « Total » pour tous les isolats.
+    def build():
+        cube = load_cube(dedup)
+        return space_time_scan(cube.ward_weeks(start, end, phenotype, nature), cube.labels[start:end + 1],
+                               cube.wards, max_weeks=max_weeks)
+    return _variant(f"space_time_scan_{start}_{end}_{phenotype}_{nature}_{max_weeks}" + _suffix(dedup), build)
+
+
+def load_resistance_series(dedup=None):
+    # (series, semaines, tests, résistants) antibiotique x service, pour le moteur d'alerte
+    return _shared("resistance_series" + _suffix(dedup), lambda: _readonly(resistance_series(*load_isolates(dedup))))
+
+
+def load_atb_summary():
+    # Tableau mensuel saisi à la main (en-tête sur deux lignes : antibiotique / T, S, R, % R, % S)
+    return _shared("atb_summary", lambda: read_excel_cached(ATB_FILE, header=[0, 1]))
+
+
+def _build_atb_flat():
+    df = load_atb_summary()
+    df.columns = [f"{col[0]} - {col[1]}" if not pd.isna(col[1]) else col[0] for col in df.columns]
+    return df.rename(columns={df.columns[0]: "Month"})
+
+
+def load_atb_flat():
+    return _shared("atb_flat", _build_atb_flat)
+
+
+def _build_atb_percent_r():
+    df = load_atb_summary()
+    mois = df[('Unnamed: 0_level_0', 'Unnamed: 0_level_1')].rename("Month")
+    percent_r_cols = df.columns[4::5]
+    df_percent_r = df[percent_r_cols].copy()
+    df_percent_r.columns = [col[1].strip() for col in percent_r_cols]
+    df_percent_r.insert(0, "Month", mois)
+    return pd.melt(df_percent_r, id_vars="Month", var_name="Antibiotic", value_name="% Resistance")
+
+
+def load_atb_percent_r():
+    return _shared("atb_percent_r", _build_atb_percent_r)
+
+
+def _atb_percent_r_values():
+    # %R numériques, sans la ligne d'en-tête "Month / % R" restée dans les données.
+    df = load_atb_percent_r()
+    df = df[df["Month"] != "Month"]
+    df["% Resistance"] = pd.to_numeric(df["% Resistance"], errors="coerce")
+    return df
+
+
+def load_atb_percent_r_groups():
+    # Un seul regroupement au chargement : antibiotique -> (Month, % Resistance).
+    return _shared("atb_percent_r_groups",
+                   lambda: grouped_arrays(_atb_percent_r_values(), "Antibiotic", ["Month", "% Resistance"]))
+
+
+def _build_atb_percent_r_wide():
+    # Une ligne par antibiotique, une colonne par mois (ordre du classeur).
+    df = _atb_percent_r_values()
+    return df.pivot_table(index="Antibiotic", columns="Month", values="% Resistance", sort=False)
+
+
+def load_atb_percent_r_wide():
+    return _shared("atb_percent_r_wide", _build_atb_percent_r_wide)
+
+
+def load_cube(dedup=None):
+    return _shared("cube" + _suffix(dedup), lambda: WeeklyCube(*load_isolates(dedup)))
+
+
+def _build_surveillance():
+    # État CUSUM / EWMA tenu à jour par ingest.py ; à défaut, rejoué une fois
+    # sur l'historique chargé.
+    path = os.path.join(STORE_DIR, STATE_FILE)
+    if os.path.exists(path):
+        return Surveillance.load(path)
+    surveillance = Surveillance()
+    surveillance.advance(*load_isolates())
+    return surveillance
+
+
+def load_surveillance():
+    return _shared("surveillance", _build_surveillance)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from isolates import DATE_COLUMN
+
+# Premier isolat par patient (esprit CLSI M39) : les cultures répétées d'un même
+# IPP ne doivent pas gonfler les effectifs MRSA ni les %R.
+# Tri par (patient, date) puis sélection vectorisée du premier de chaque groupe.
+PATIENT_COLUMN = "IPP_PASTEL"
+EPISODE_DAYS = 30
+WINDOWS = {
+    "year": "Premier isolat / patient / an",
+    "30d": f"Premier isolat / patient / {EPISODE_DAYS} jours",
+    "phenotype": "Premier isolat / patient / phénotype",
+}
+
+
+def _group_first(keys):
+    # keys : colonnes déjà triées ; vrai sur la première ligne de chaque groupe.
+    first = np.ones(len(keys[0]), dtype=bool)
+    if len(first) > 1:
+        same = np.ones(len(first) - 1, dtype=bool)
+        for key in keys:
+            same &= key[1:] == key[:-1]
+        first[1:] = ~same
+    return first
+
+
+def _episode_first(patients, days):
+    # Nouvel épisode dès qu'un isolat survient au moins EPISODE_DAYS jours après
+    # le dernier isolat retenu pour ce patient. Chaque tour retient, pour tous
+    # les patients à la fois, le prochain isolat éligible : le nombre de tours
+    # est le nombre maximal d'épisodes d'un patient, pas le nombre d'isolats.
+    kept = _group_first([patients])
+    anchor = np.full(patients.max() + 1 if len(patients) else 0, np.iinfo(np.int64).min)
+    anchor[patients[kept]] = days[kept]
+    while True:
+        eligible = np.flatnonzero(~kept & (days >= anchor[patients] + EPISODE_DAYS))
+        if not len(eligible):
+            return kept
+        _, first = np.unique(patients[eligible], return_index=True)
+        chosen = eligible[first]
+        kept[chosen] = True
+        anchor[patients[chosen]] = days[chosen]
+
+
+def first_isolate_mask(meta, window="year", phenotypes=None):
+    # Masque booléen aligné sur meta : vrai pour les isolats retenus.
+    # phenotypes : codes par isolat (classify_phenotypes), requis pour "phenotype".
+    if window not in WINDOWS:
+        raise ValueError(f"Fenêtre de dédoublonnage inconnue : {window}")
+    dates = pd.to_datetime(meta[DATE_COLUMN], errors="coerce")
+    valid = dates.notna().to_numpy()
+
+    # Un IPP manquant est traité comme un patient distinct.
+    ipp = meta[PATIENT_COLUMN].astype("string").fillna("").to_numpy(dtype=object)
+    missing = ipp == ""
+    ipp[missing] = ["?" + str(i) for i in np.flatnonzero(missing)]
+    patients = pd.factorize(ipp)[0]
+    days = (dates.dt.normalize() - pd.Timestamp("1970-01-01")).dt.days.fillna(0).to_numpy(dtype=np.int64)
+
+    # Tri stable par patient puis date : à date égale, l'ordre de l'export.
+    order = np.lexsort((np.arange(len(meta)), days, patients))
+    order = order[valid[order]]
+    p, d = patients[order], days[order]
+
+    if window == "year":
+        years = dates.dt.year.fillna(0).to_numpy(dtype=np.int64)[order]
+        sub = np.lexsort((np.arange(len(order)), years, p))
+        first = np.zeros(len(order), dtype=bool)
+        first[sub] = _group_first([p[sub], years[sub]])
+    elif window == "phenotype":
+        if phenotypes is None:
+            raise ValueError("Les phénotypes sont requis pour la fenêtre 'phenotype'")
+        years = dates.dt.year.fillna(0).to_numpy(dtype=np.int64)[order]
+        pheno = np.asarray(phenotypes)[order]
+        sub = np.lexsort((np.arange(len(order)), pheno, years, p))
+        first = np.zeros(len(order), dtype=bool)
+        first[sub] = _group_first([p[sub], years[sub], pheno[sub]])
+    else:
+        first = _episode_first(p, d)
+
+    mask = np.zeros(len(meta), dtype=bool)
+    mask[order[first]] = True
+    return mask
@@ -0,0 +1,127 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Instrumentation légère des étapes du pipeline (lecture, semaines ISO,
+# matrice S/I/R, %R, alertes, jeux partagés, figures, envoi Plotly).
+# Une page ouvre une exécution avec start_run() ; chaque étape franchie
+# pendant cette exécution enregistre sa durée, ses lignes en entrée et en
+# sortie, la variation de mémoire résidente du processus et, pour les
+# caches, « hit » ou « miss ». finish_run() écrit une ligne JSON par étape
+# dans LOG_FILE. Hors exécution (batch, rapport), les étapes ne coûtent
+# qu'un test.
+#
+# L'état est propre au thread : Streamlit exécute chaque session dans le
+# sien, les exécutions concurrentes ne se mélangent pas.
+LOG_FILE = os.environ.get("DIAGNOSTICS_LOG", "diagnostics.jsonl")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_local = threading.local()
+_logger = logging.getLogger("diagnostics")
+_logger_lock = threading.Lock()
+
+
+def _rss():
+    # Mémoire résidente du processus (Linux) ; None ailleurs.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def rows(value):
+    # Nombre de lignes d'un résultat (DataFrame, tableau, tuple (meta, matrix)...).
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (str, bytes, dict)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def start_run(page):
+    _local.run = {"id": uuid.uuid4().hex[:12], "page": page, "started": time.time(), "records": [], "stack": []}
+
+
+def current():
+    return getattr(_local, "run", None)
+
+
+@contextmanager
+def stage(name, rows_in=None, cache=None):
+    # Le dict produit peut être complété par l'appelant (rows_out, cache...).
+    run = current()
+    if run is None:
+        yield {}
+        return
+    record = {"stage": name, "depth": len(run["stack"]), "seconds": None,
+              "rows_in": rows_in, "rows_out": None, "memory_mb": None, "cache": cache}
+    run["records"].append(record)
+    run["stack"].append(record)
+    before = _rss()
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        after = _rss()
+        if before is not None and after is not None:
+            record["memory_mb"] = (after - before) / 2 ** 20
+        run["stack"].pop()
+
+
+def annotate(**fields):
+    # Complète l'étape en cours (par exemple cache="hit").
+    run = current()
+    if run is not None and run["stack"]:
+        run["stack"][-1].update(fields)
+
+
+def timed(name):
+    # Décorateur : lignes en entrée = premier argument, en sortie = résultat.
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current() is None:
+                return func(*args, **kwargs)
+            with stage(name, rows(args[0]) if args else None) as record:
+                result = func(*args, **kwargs)
+                record["rows_out"] = rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def _log():
+    with _logger_lock:
+        if not _logger.handlers:
+            handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+    return _logger
+
+
+def finish_run():
+    # Termine l'exécution, écrit ses étapes dans le journal et les retourne.
+    run = current()
+    if run is None:
+        return []
+    _local.run = None
+    logger = _log()
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(run["started"]))
+    for record in run["records"]:
+        logger.info(json.dumps({"time": timestamp, "run": run["id"], "page": run["page"], **record},
+                               ensure_ascii=False, default=str))
+    return run["records"]
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Réduction des séries temporelles avant envoi au navigateur : une série
+# quotidienne sur plusieurs années est ramenée à environ CHART_POINTS points,
+# de l'ordre de la largeur du graphique en pixels. Les fonctions retournent
+# des indices (croissants) de points à garder, applicables à toutes les
+# colonnes de la série.
+#   lttb   : Largest-Triangle-Three-Buckets, garde la forme visuelle de la
+#            courbe (les pics isolés forment de grands triangles et restent) ;
+#   minmax : minimum et maximum de chaque intervalle, garantit que chaque
+#            pic et chaque creux est tracé.
+CHART_POINTS = 1200
+METHODS = {"lttb": "LTTB (forme de la courbe)", "minmax": "Min / max par intervalle"}
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, points=CHART_POINTS):
+    x, y = _as_float(x), _as_float(y)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    # n - 2 points intérieurs répartis en points - 2 intervalles ; le premier
+    # et le dernier point sont toujours gardés.
+    edges = (np.arange(points - 1) * ((n - 2) / (points - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Moyenne de chaque intervalle (sommes cumulées), plus le dernier point
+    # comme « intervalle suivant » du dernier intervalle.
+    cx, cy = np.concatenate([[0], np.cumsum(x)]), np.concatenate([[0], np.cumsum(y)])
+    sizes = np.diff(edges)
+    mean_x = np.append((cx[edges[1:]] - cx[edges[:-1]]) / sizes, x[-1])
+    mean_y = np.append((cy[edges[1:]] - cy[edges[:-1]]) / sizes, y[-1])
+
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Aire du triangle (point gardé précédent, candidat, moyenne suivante).
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, points=CHART_POINTS):
+    y = _as_float(y)
+    n = len(y)
+    buckets = points // 2
+    if points >= n or buckets < 1:
+        return np.arange(n)
+
+    # Tri par (intervalle, valeur) : le premier et le dernier élément de
+    # chaque intervalle sont son minimum et son maximum.
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([[0, n - 1], order[starts], order[ends]]))
+
+
+def downsample(x, y, points=CHART_POINTS, method="lttb"):
+    if method == "minmax":
+        return minmax(y, points)
+    return lttb(x, y, points)
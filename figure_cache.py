@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from diagnostics import stage
+
+# Cache LRU des figures Plotly construites, partagé par toutes les sessions
+# du processus serveur. La clé est l'état normalisé des filtres (semaines,
+# phénotypes, antibiotiques, service...) : une vue déjà affichée, par
+# n'importe quel utilisateur, ne refait ni le travail pandas ni la
+# construction trace par trace. La taille est bornée par le volume des
+# données des traces (octets des tableaux, sans sérialiser la figure) ;
+# les moins récemment servies sont évincées en premier.
+#
+# On garde l'objet Figure plutôt que son JSON : st.plotly_chart revalide
+# entièrement un dict (plusieurs fois le coût de construction), alors qu'il
+# ne fait que sérialiser une Figure. Les figures servies sont partagées et
+# ne doivent pas être modifiées par les pages.
+MAX_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+_figures = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def _normalize(value):
+    # Valeurs de widgets -> clé hachable et stable (listes, tableaux, dates...).
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_normalize(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _nbytes(value):
+    # Estimation du volume des données d'une trace (tableaux, listes, textes).
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+
+def cached_figure(name, filters, build):
+    # name : identifiant de la figure dans sa page ; build() la construit.
+    key = (name, datasets.generation(), _normalize(filters))
+    with _lock:
+        entry = _figures.get(key)
+        if entry is not None:
+            _figures.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    if entry is not None:
+        with stage(f"figure {name}", cache="hit"):
+            return entry[0]
+
+    with stage(f"figure {name}", cache="miss"):
+        fig = build()
+        # fig._data : dicts des traces tels que stockés, sans copie profonde.
+        size = _nbytes(fig._data)
+    with _lock:
+        if key not in _figures:
+            _figures[key] = (fig, size)
+            _stats["bytes"] += size
+        while _stats["bytes"] > MAX_BYTES and len(_figures) > 1:
+            _, (_, evicted) = _figures.popitem(last=False)
+            _stats["bytes"] -= evicted
+            _stats["evictions"] += 1
+    return fig
+
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_figures))
+
+
+def clear():
+    with _lock:
+        _figures.clear()
+        _stats["bytes"] = 0
@@ -0,0 +1,150 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from downsample import CHART_POINTS, downsample
+
+# Figures Plotly des tableaux de bord, construites à partir des tables déjà
+# agrégées (cube.frame, load_resistance) : réutilisables hors de Streamlit,
+# par exemple pour l'export statique du rapport.
+# Au-delà de WEBGL_POINTS points dans une figure, les traces passent en
+# WebGL (Scattergl) : le rendu SVG fige la page avec des centaines de séries.
+WEBGL_POINTS = 2000
+PHENOTYPE_COLORS = {
+    "MRSA": "orange",
+    "VRSA": "red",
+    "Wild": "green",
+    "others": "blue"
+}
+
+
+def cases_figure(df, phenotypes, title="Évolution hebdomadaire du nombre de cas par phénotype"):
+    fig = go.Figure()
+    for pheno in phenotypes:
+        fig.add_trace(go.Scatter(
+            x=df["Semaine"],
+            y=df[pheno],
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Cas: %{{y}}<extra></extra>",
+            line_color=PHENOTYPE_COLORS[pheno]
+        ))
+    fig.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Nombre de cas",
+        title=title,
+        hovermode="x unified",
+        height=500
+    )
+    return fig
+
+
+def prevalence_figure(df, phenotypes, title="Évolution hebdomadaire des phénotypes en %"):
+    fig = go.Figure()
+    for pheno in phenotypes:
+        fig.add_trace(go.Scatter(
+            x=df["Semaine"],
+            y=(df[pheno] / df["Total"]) * 100,
+            mode='lines+markers',
+            name=pheno,
+            marker=dict(size=8),
+            line=dict(width=3),
+            hovertemplate=f"<b>{pheno}</b><br>Semaine: %{{x}}<br>Prévalence: %{{y:.1f}}%<extra></extra>",
+            line_color=PHENOTYPE_COLORS[pheno]
+        ))
+    fig.update_layout(
+        xaxis_title="Semaine",
+        yaxis_title="Prévalence (%)",
+        title=title,
+        hovermode="x unified",
+        height=500
+    )
+    return fig
+
+
+def scatter_type(groups, names, column):
+    # Scatter ou Scattergl selon le nombre total de points à tracer.
+    points = sum(len(groups[name][column]) for name in names if name in groups)
+    return go.Scattergl if points > WEBGL_POINTS else go.Scatter
+
+
+def resistance_figure(groups, antibiotics, title="Évolution hebdomadaire de la résistance (%R)"):
+    # groups : {antibiotique: {"Date", "Week", "% Resistance": tableaux}}
+    # (datasets.load_resistance_groups), tracés sans refiltrer la table longue.
+    scatter = scatter_type(groups, antibiotics, "Date")
+    fig = go.Figure()
+    for abx in antibiotics:
+        data = groups[abx]
+        fig.add_trace(scatter(
+            x=data["Date"],
+            y=data["% Resistance"],
+            mode="lines+markers",
+            name=abx,
+            customdata=data["Week"],
+            hovertemplate=f"<b>{abx}</b><br>Semaine: %{{customdata}}<br>%R: %{{y:.1f}}%"
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Semaine",
+        yaxis_title="% Résistance",
+        hovermode="x unified",
+        yaxis=dict(range=[0, 100])
+    )
+    return fig
+
+
+def daily_figure(df, phenotypes, points=CHART_POINTS, method="lttb",
+                 title="Nombre de cas quotidien par phénotype"):
+    # df : effectifs quotidiens (load_daily_phenotypes) déjà restreints à la
+    # plage affichée ; chaque série est réduite à ~points points.
+    fig = go.Figure()
+    for pheno in phenotypes:
+        keep = downsample(df["Date"], df[pheno], points, method)
+        fig.add_trace(go.Scatter(
+            x=df["Date"].to_numpy()[keep],
+            y=df[pheno].to_numpy()[keep],
+            mode="lines",
+            name=pheno,
+            hovertemplate=f"<b>{pheno}</b><br>%{{x|%d/%m/%Y}}<br>Cas: %{{y}}<extra></extra>",
+            line_color=PHENOTYPE_COLORS[pheno]
+        ))
+    fig.update_layout(
+        xaxis_title="Date de prélèvement",
+        yaxis_title="Nombre de cas",
+        title=title,
+        hovermode="x unified",
+        height=500
+    )
+    return fig
+
+
+def coresistance_figure(result, min_tests, title="Co-résistance : P(R à B | R à A)"):
+    # result : coresistance.CoResistance ; lignes A, colonnes B. Seuls les
+    # antibiotiques avec au moins une paire renseignée sont affichés.
+    conditional = result.conditional(min_tests)
+    np.fill_diagonal(conditional, np.nan)
+    shown = ~np.isnan(conditional).all(axis=1) | ~np.isnan(conditional).all(axis=0)
+    names = [n for n, k in zip(result.names, shown) if k]
+    grid = np.ix_(shown, shown)
+    counts = np.dstack([result.both_resistant[grid], result.resistant_tested[grid]])
+    fig = go.Figure(go.Heatmap(
+        z=conditional[grid],
+        x=names,
+        y=names,
+        customdata=counts,
+        colorscale="Reds",
+        zmin=0,
+        zmax=100,
+        colorbar=dict(title="%"),
+        hovertemplate="R à <b>%{y}</b> → R à <b>%{x}</b> : %{z:.1f}%<br>"
+                      "%{customdata[0]} / %{customdata[1]} isolats<extra></extra>"
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Antibiotique B",
+        yaxis_title="Antibiotique A",
+        yaxis=dict(autorange="reversed"),
+        height=max(500, 18 * len(names) + 200)
+    )
+    return fig
@@ -0,0 +1,223 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from data_cache import read_excel_cached
+from diagnostics import timed
+from isolates import DATE_COLUMN, KEY_COLUMNS, WEEK_COLUMNS, add_iso_week
+from phenotypes import weekly_phenotypes
+from resistance import weekly_resistance
+from surveillance import STATE_FILE, Surveillance
+
+# Ingestion incrémentale des extractions hebdomadaires d'isolats.
+# Le stock est découpé par semaine ISO (year=AAAA/week=SS/isolates.parquet) ;
+# une nouvelle extraction ne réécrit que les semaines qu'elle touche, puis ne
+# recalcule les agrégats que pour ces semaines. Le coût d'un rafraîchissement
+# ne dépend donc pas de la profondeur de l'historique.
+STORE_DIR = "isolates_store"
+# Les agrégats suivent le schéma des tableaux de bord (Année, Week).
+AGGREGATE_KEYS = ["Année", "Week"]
+
+
+def weekly_counts(df):
+    counts = df.groupby(WEEK_COLUMNS).size().reset_index(name="Total")
+    return counts.rename(columns={"Semaine": "Week"})
+
+
+# Agrégats dérivés, recalculés semaine par semaine : nom -> fonction(isolats).
+AGGREGATES = {
+    "weekly_counts": weekly_counts,
+    "weekly_phenotypes": weekly_phenotypes,
+    "weekly_resistance": weekly_resistance,
+}
+
+
+def _partition_path(store_dir, year, week):
+    return os.path.join(store_dir, f"year={year}", f"week={week:02d}", "isolates.parquet")
+
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _read_state(store_dir):
+    try:
+        with open(os.path.join(store_dir, "watermark.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"watermark": None}
+
+
+def _write_state(store_dir, state):
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, "watermark.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _keys(df):
+    return pd.MultiIndex.from_frame(df[KEY_COLUMNS])
+
+
+def read_partition(store_dir, year, week):
+    path = _partition_path(store_dir, year, week)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_parquet(path)
+    df["Année"] = year
+    df["Semaine"] = week
+    return df
+
+
+def _partitions(store_dir):
+    # (année, semaine) -> chemin, d'après l'arborescence year=AAAA/week=SS.
+    partitions = {}
+    for path in glob.glob(os.path.join(store_dir, "year=*", "week=*", "isolates.parquet")):
+        week_dir = os.path.dirname(path)
+        year = int(os.path.basename(os.path.dirname(week_dir)).split("=")[1])
+        week = int(os.path.basename(week_dir).split("=")[1])
+        partitions[(year, week)] = path
+    return partitions
+
+
+@timed("read_store")
+def read_store(store_dir=STORE_DIR, start=None, end=None, columns=None, exclude=None):
+    # Isolats prélevés entre start et end (inclus), limités aux colonnes
+    # demandées (ou à toutes sauf exclude). Seules les partitions qui
+    # chevauchent la plage sont ouvertes, en un seul balayage pyarrow :
+    # projection des colonnes et filtre sur la date poussés au lecteur
+    # parquet, conversion en DataFrame une seule fois.
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    if columns is not None:
+        columns = list(dict.fromkeys([DATE_COLUMN] + list(columns)))
+
+    paths = []
+    for (year, week), path in sorted(_partitions(store_dir).items()):
+        monday = pd.Timestamp(datetime.date.fromisocalendar(year, week, 1))
+        if (start is None or monday + pd.Timedelta(days=7) > start) and (end is None or monday <= end):
+            paths.append(path)
+    if not paths:
+        return pd.DataFrame(columns=(columns or [DATE_COLUMN]) + WEEK_COLUMNS)
+
+    predicate = None
+    if start is not None:
+        predicate = ds.field(DATE_COLUMN) >= start
+    if end is not None:
+        below = ds.field(DATE_COLUMN) <= end
+        predicate = below if predicate is None else predicate & below
+    dataset = ds.dataset(paths, format="parquet")
+    if columns is None and exclude:
+        columns = [name for name in dataset.schema.names if name not in exclude]
+    table = dataset.to_table(columns=columns, filter=predicate)
+    df = table.to_pandas()
+    iso = df[DATE_COLUMN].dt.isocalendar()
+    df["Année"] = iso["year"].astype(int)
+    df["Semaine"] = iso["week"].astype(int)
+    return df
+
+
+def has_store(store_dir=STORE_DIR):
+    return bool(_partitions(store_dir))
+
+
+def watermark(store_dir=STORE_DIR):
+    # Date du prélèvement le plus récent du stock, None s'il est vide.
+    value = _read_state(store_dir)["watermark"]
+    return pd.Timestamp(value) if value else None
+
+
+def prepare_extract(df):
+    # Schéma homogène entre partitions : tout en texte, sauf la date de
+    # prélèvement et la semaine ISO qui servent au partitionnement.
+    df = add_iso_week(df.astype("string"))
+    return df.drop_duplicates(subset=KEY_COLUMNS)
+
+
+def _update_aggregates(store_dir, weeks):
+    # Les agrégats des semaines touchées sont recalculés sur leur partition
+    # complète puis remplacés ; les autres semaines ne sont pas relues.
+    fresh = [read_partition(store_dir, year, week) for year, week in weeks]
+    fresh = pd.concat([df for df in fresh if df is not None], ignore_index=True)
+    touched = pd.MultiIndex.from_tuples(sorted(weeks), names=AGGREGATE_KEYS)
+    for name, aggregate in AGGREGATES.items():
+        path = os.path.join(store_dir, "aggregates", f"{name}.parquet")
+        result = aggregate(fresh)
+        if os.path.exists(path):
+            previous = pd.read_parquet(path)
+            keep = ~pd.MultiIndex.from_frame(previous[AGGREGATE_KEYS]).isin(touched)
+            result = pd.concat([previous[keep], result], ignore_index=True)
+        _write_parquet(result.sort_values(AGGREGATE_KEYS, ignore_index=True), path)
+
+
+def _update_surveillance(store_dir, latest):
+    # CUSUM / EWMA : seules les semaines postérieures à l'état sauvegardé sont
+    # lues. Un résultat tardif pour une semaine déjà traitée ne la rejoue pas.
+    path = os.path.join(store_dir, STATE_FILE)
+    surveillance = Surveillance.load(path) if os.path.exists(path) else Surveillance()
+    start = None if surveillance.week is None else surveillance.week + pd.Timedelta(days=7)
+    fresh = read_store(store_dir, start=start)
+    if not fresh.empty and surveillance.advance(fresh, latest=latest):
+        surveillance.save(path)
+
+
+def ingest_extract(path, store_dir=STORE_DIR):
+    state = _read_state(store_dir)
+    new = prepare_extract(read_excel_cached(path, sheet_name=0))
+    watermark = pd.Timestamp(state["watermark"]) if state["watermark"] else None
+
+    weeks = []
+    for (year, week), rows in new.groupby(WEEK_COLUMNS):
+        year, week = int(year), int(week)
+        partition = _partition_path(store_dir, year, week)
+        rows = rows.drop(columns=WEEK_COLUMNS)
+        # Une partition existante est toujours complétée, jamais écrasée (une
+        # extraction peut couper une semaine en deux). Au-delà du filigrane,
+        # elle ne peut pas contenir d'isolat de l'extraction : pas de
+        # dédoublonnage par clé.
+        if os.path.exists(partition):
+            stored = pd.read_parquet(partition)
+            if watermark is None or rows[DATE_COLUMN].min() <= watermark:
+                rows = rows[~_keys(rows).isin(_keys(stored))]
+                if rows.empty:
+                    continue
+            rows = pd.concat([stored, rows], ignore_index=True)
+        _write_parquet(rows, partition)
+        weeks.append((year, week))
+
+    if weeks:
+        _update_aggregates(store_dir, weeks)
+    latest = new[DATE_COLUMN].max()
+    if watermark is None or latest > watermark:
+        state["watermark"] = latest.isoformat()
+        _update_surveillance(store_dir, latest)
+    _write_state(store_dir, state)
+    return weeks
+
+
+def load_aggregate(name, store_dir=STORE_DIR, years=None):
+    # years : (première, dernière) année ISO à lire, bornes incluses.
+    filters = None
+    if years is not None:
+        filters = [("Année", ">=", years[0]), ("Année", "<=", years[1])]
+    return pd.read_parquet(os.path.join(store_dir, "aggregates", f"{name}.parquet"), filters=filters)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion d'une extraction hebdomadaire d'isolats")
+    parser.add_argument("extracts", nargs="+", help="Classeurs .xlsx à ajouter au stock")
+    parser.add_argument("--store", default=STORE_DIR, help="Répertoire du stock partitionné")
+    args = parser.parse_args()
+    for extract in args.extracts:
+        touched = ingest_extract(extract, args.store)
+        print(f"{extract} : {len(touched)} semaine(s) mise(s) à jour")
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from diagnostics import timed
+
+# Schéma de l'export brut des isolats (staphylococcus_2024_new.xlsx) :
+# dix colonnes d'identification, puis une colonne par antibiotique testé.
+SOURCE_FILE = "staphylococcus_2024_new.xlsx"
+DATE_COLUMN = "DATE_PRELEVEMENT"
+KEY_COLUMNS = ["ID_DEMANDE", "NUM_SPECIMEN"]
+ID_COLUMNS = [
+    "ID_DEMANDE", "IPP_PASTEL", "DATE_ENTREE", "DEMANDEUR", "LIBELLE_DEMANDEUR",
+    "NUM_SPECIMEN", "DATE_PRELEVEMENT", "NATURE", "CODE_GERME", "LIB_GERME",
+]
+WEEK_COLUMNS = ["Année", "Semaine"]
+DERIVED_COLUMNS = WEEK_COLUMNS + ["Week", "Date", "Mois"]
+
+
+def result_columns(df):
+    return [col for col in df.columns if col not in ID_COLUMNS and col not in DERIVED_COLUMNS]
+
+
+@timed("iso_week")
+def add_iso_week(df):
+    # Date de prélèvement -> année et semaine ISO ; les dates illisibles sont écartées.
+    df = df.copy()
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors="coerce")
+    df = df.dropna(subset=[DATE_COLUMN])
+    iso = df[DATE_COLUMN].dt.isocalendar()
+    df["Année"] = iso["year"].astype(int)
+    df["Semaine"] = iso["week"].astype(int)
+    return df
+
+
+# Libellés des antibiotiques les plus suivis ; les autres gardent leur code.
+ANTIBIOTIC_NAMES = {
+    "OX": "Oxacilline",
+    "FOX": "Céfoxitine",
+    "VA": "Vancomycine",
+    "TPN": "Teicoplanine",
+    "GM": "Gentamicine",
+    "K": "Kanamycine",
+    "E": "Erythromycine",
+    "CC": "Clindamycine",
+    "QDA": "Pristinamycine",
+    "LEV": "Lévofloxacine",
+    "SXT": "Cotrimoxazole",
+    "RIF": "Rifampicine",
+    "FA": "Acide fusidique",
+    "FOS": "Fosfomycine",
+    "TET": "Tétracycline",
+    "TGC": "Tigécycline",
+    "LNZ": "Linezolid",
+    "DAP": "Daptomycine",
+    "MUP": "Mupirocine",
+}
+
+
+def antibiotic_name(code):
+    return ANTIBIOTIC_NAMES.get(code, code.strip())
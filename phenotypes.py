@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+from isolates import DATE_COLUMN, WEEK_COLUMNS, add_iso_week
+from sir_matrix import SIRMatrix
+
+# Classification des isolats en phénotypes à partir des résultats bruts.
+# MRSA : résistance à l'oxacilline ou à la céfoxitine (hors VRSA).
+# VRSA : résistance à la vancomycine.
+# others : résistance à un marqueur de OTHERS_COLUMNS (clindamycine,
+# teicoplanine, cotrimoxazole, gentamicine, daptomycine, linézolide), ou
+# isolat sans aucun résultat. Les résistances de fond (érythromycine,
+# acide fusidique, tétracycline...) ne comptent pas, comme dans le classeur
+# du laboratoire (staph_aureus_phenotypes.xlsx).
+# Wild : isolat testé sans aucune de ces résistances.
+PHENOTYPES = ["MRSA", "VRSA", "Wild", "others"]
+OXACILLIN_COLUMNS = ["OX", "OX1", "OX5", "FOX", "FOX30"]
+VANCOMYCIN_COLUMNS = ["VA", "VA5", "VA30"]
+OTHERS_COLUMNS = ["CC", "CLI", "CLIN", "TPN", "TEC", "SXT", "SXT1", "GM", "GM10", "GEN", "DAP", "LNZ", "LNZ10", "LZ"]
+
+MRSA, VRSA, WILD, OTHERS = range(4)
+
+
+def classify_phenotypes(matrix):
+    # Une seule passe vectorisée sur la matrice int8 isolats x antibiotiques.
+    resistant = matrix.resistant()
+    oxa = resistant[:, matrix.positions(OXACILLIN_COLUMNS)].any(axis=1)
+    vanco = resistant[:, matrix.positions(VANCOMYCIN_COLUMNS)].any(axis=1)
+    marker = resistant[:, matrix.positions(OTHERS_COLUMNS)].any(axis=1)
+    wild = ~marker & matrix.tested().any(axis=1)
+
+    codes = np.full(len(matrix), OTHERS, dtype=np.int8)
+    codes[wild] = WILD
+    codes[oxa] = MRSA
+    codes[vanco] = VRSA
+    return codes
+
+
+@timed("phenotypes")
+def weekly_phenotypes(df, matrix=None):
+    # Table hebdomadaire au format des tableaux de bord :
+    # Année, Week, Date (lundi de la semaine ISO), Total, MRSA, VRSA, Wild, others.
+    if matrix is None:
+        matrix = SIRMatrix.from_frame(df)
+    df = add_iso_week(df)
+    codes = classify_phenotypes(matrix.align(df.index))
+
+    weeks = df[WEEK_COLUMNS].to_numpy()
+    keys, inverse = np.unique(weeks, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.zeros((len(keys), len(PHENOTYPES)), dtype=np.int64)
+    np.add.at(counts, (inverse, codes), 1)
+
+    out = pd.DataFrame(counts, columns=PHENOTYPES)
+    out.insert(0, "Année", keys[:, 0])
+    out.insert(1, "Week", keys[:, 1])
+    out.insert(2, "Date", pd.to_datetime(
+        [f"{year}-W{week:02d}-1" for year, week in keys], format="%G-W%V-%u"
+    ))
+    out["Total"] = counts.sum(axis=1)
+    return out
+
+
+@timed("daily_phenotypes")
+def daily_phenotypes(df, matrix=None):
+    # Effectifs quotidiens par phénotype (+ Total) sur des jours contigus,
+    # jours sans isolat compris (à 0) : Date, MRSA, VRSA, Wild, others, Total.
+    if matrix is None:
+        matrix = SIRMatrix.from_frame(df)
+    df = add_iso_week(df)
+    codes = classify_phenotypes(matrix.align(df.index))
+
+    days = df[DATE_COLUMN].dt.normalize()
+    first = days.min()
+    day_index = ((days - first).dt.days).to_numpy()
+    counts = np.zeros((day_index.max() + 1 if len(df) else 0, len(PHENOTYPES)), dtype=np.int64)
+    np.add.at(counts, (day_index, codes), 1)
+
+    out = pd.DataFrame(counts, columns=PHENOTYPES)
+    out.insert(0, "Date", pd.date_range(first, periods=len(counts), freq="D"))
+    out["Total"] = counts.sum(axis=1)
+    return out
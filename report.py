@@ -0,0 +1,226 @@
+import argparse
+import html
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import datasets
+from alerts import DEFAULT_WINDOW, RULES, alert_table, rate
+from cube import ALL_WARDS
+from dedup import WINDOWS
+from figures import cases_figure, prevalence_figure, resistance_figure
+from phenotypes import PHENOTYPES
+from resistance import SERIES_MIN_TESTS
+
+# Export statique du rapport hebdomadaire d'hygiène : une page de synthèse
+# (tous services) et une page par service, avec les mêmes figures et
+# alertes que les tableaux de bord. Les données sont agrégées une fois dans
+# le processus principal ; la construction des figures et leur sérialisation
+# HTML, qui dominent le temps de calcul, sont réparties page par page sur un
+# pool de processus. Le dossier produit est autonome (plotly.js inclus une
+# seule fois, aucun accès réseau nécessaire).
+DEFAULT_OUTPUT = "rapport"
+MIN_WARD_ISOLATES = 30
+PLOTLY_JS = "plotly.min.js"
+
+PAGE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{root}{plotly}"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; font-size: 0.9em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.2em 0.5em; }}
+.warning {{ background: #fff3cd; padding: 0.5em; }}
+.error {{ background: #f8d7da; padding: 0.5em; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-").lower() or "service"
+
+
+def _alert_blocks(alerts):
+    blocks = []
+    if alerts["mrsa_weeks_above"] > 0:
+        blocks.append(("warning", f"⚠️ ALERTE : Le nombre de cas MRSA dépasse la moyenne + 2 écarts-types "
+                                  f"({alerts['mrsa_threshold']:.1f}) sur {alerts['mrsa_weeks_above']} semaine(s)"))
+    if alerts["vrsa_cases"] > 0:
+        blocks.append(("error", f"🚨 ALERTE : {alerts['vrsa_cases']} cas de VRSA détectés dans la période sélectionnée"))
+    return blocks
+
+
+def _render(block):
+    # Exécuté dans un processus du pool : un bloc (titre, alerte, table ou figure) -> HTML.
+    kind, *content = block
+    if kind == "heading":
+        return f"<h{content[0]}>{html.escape(content[1])}</h{content[0]}>"
+    if kind in ("warning", "error"):
+        return f'<p class="{kind}">{html.escape(content[0])}</p>'
+    if kind == "text":
+        return f"<p>{content[0]}</p>"
+    if kind == "table":
+        return content[0].to_html(index=False, float_format="%.1f", na_rep="", escape=True)
+    builder = {"cases": cases_figure, "prevalence": prevalence_figure, "resistance": resistance_figure}[kind]
+    return pio.to_html(builder(*content), full_html=False, include_plotlyjs=False)
+
+
+def _phenotype_blocks(cube, start, end, ward=None):
+    df = cube.frame(start, end, ward)
+    cases, prevalence = (df, PHENOTYPES), (df, PHENOTYPES)
+    if ward is not None:
+        cases += (f"{ward} - nombre de cas par phénotype",)
+        prevalence += (f"{ward} - phénotypes en %",)
+    return [
+        ("heading", 2, "🧪 Nombre de cas par semaine"),
+        ("cases",) + cases,
+        ("heading", 2, "📊 Prévalence (%) par semaine"),
+        ("prevalence",) + prevalence,
+        ("heading", 2, "🚨 Alertes de surveillance"),
+    ] + _alert_blocks(cube.alerts(start, end, ward))
+
+
+def _ward_groups(series, weeks, tested, resistant, ward, kept):
+    # Séries %R du service au format de datasets.load_resistance_groups,
+    # semaines testées de la période seulement.
+    groups = {}
+    for i in np.flatnonzero(series["Service"].to_numpy() == ward):
+        week = kept & (tested[i] > 0)
+        groups[series["Antibiotic"].iat[i]] = {
+            "Date": weeks[week].to_numpy(),
+            "Week": weeks[week].isocalendar().week.to_numpy(),
+            "% Resistance": resistant[i, week] / tested[i, week] * 100,
+        }
+    return groups
+
+
+def build_pages(start=None, end=None, dedup=None, min_isolates=MIN_WARD_ISOLATES):
+    # Description de toutes les pages (données déjà agrégées, prêtes à tracer).
+    cube = datasets.load_cube(dedup)
+    start = cube.position[start] if start else 0
+    end = cube.position[end] if end else len(cube.labels) - 1
+    period = f"{cube.labels[start]} → {cube.labels[end]}"
+
+    series, weeks, tested, resistant = datasets.load_resistance_series(dedup)
+    resistance_alerts = alert_table(rate(resistant, tested), series, weeks, DEFAULT_WINDOW, tested=tested)
+    resistance_alerts = resistance_alerts[
+        (resistance_alerts["Période"] >= cube.dates[start]) & (resistance_alerts["Période"] <= cube.dates[end])
+    ]
+    breakdown = cube.ward_breakdown(start, end)
+    wards = breakdown.loc[breakdown["Total"] >= min_isolates, "Service"].tolist()
+
+    # Synthèse tous services
+    overview = [("heading", 1, f"Rapport hebdomadaire - Staphylococcus aureus ({period})")]
+    if dedup is not None:
+        overview.append(("text", html.escape(WINDOWS[dedup])))
+    overview += _phenotype_blocks(cube, start, end)
+
+    surveillance = datasets.load_surveillance()
+    if surveillance.week is not None:
+        signals = surveillance.table()
+        overview.append(("heading", 2, f"📡 Surveillance CUSUM / EWMA (semaine du {surveillance.week:%d/%m/%Y})"))
+        overview += [("error", f"🚨 SIGNAL : rupture détectée sur « {s} » la dernière semaine")
+                     for s in signals.loc[signals["Signal"], "Série"]]
+        overview.append(("table", signals[signals["Dernier signal"].notna()].sort_values("Dernier signal", ascending=False)))
+
+    percent_r = datasets.load_atb_percent_r_wide()
+    tukey = alert_table(percent_r.to_numpy(), percent_r.index.to_frame(index=False), percent_r.columns)
+    tukey = tukey[tukey["Règle"] == RULES["tukey"]]
+    overview.append(("heading", 2, "🧬 Antibiotiques - règle de Tukey (classeur mensuel)"))
+    overview.append(("table", tukey))
+
+    groups = datasets.load_resistance_groups("week", dedup)
+    overall = resistance_alerts[resistance_alerts["Service"] == ALL_WARDS]
+    overall_by_abx = dict(tuple(overall.groupby("Antibiotic", sort=False)))
+    overview.append(("heading", 2, "📆 Résistance hebdomadaire par antibiotique"))
+    frequent = series.loc[series["Service"] == ALL_WARDS, "Antibiotic"]
+    for abx in sorted(frequent.unique()):
+        data = groups[abx]
+        kept = (data["Date"] >= cube.dates[start]) & (data["Date"] <= cube.dates[end])
+        data = {column: values[kept] for column, values in data.items()}
+        overview.append(("resistance", {abx: data}, [abx], f"%R hebdomadaire - {abx}"))
+        if abx in overall_by_abx:
+            overview.append(("table", overall_by_abx[abx]))
+
+    paths = {ward: f"services/{i:03d}-{_slug(ward)}.html" for i, ward in enumerate(wards)}
+    links = breakdown[breakdown["Service"].isin(wards)].copy()
+    links["Service"] = [f'<a href="{paths[w]}">{html.escape(w)}</a>' for w in links["Service"]]
+    overview.append(("heading", 2, f"🏥 Services (au moins {min_isolates} isolats)"))
+    overview.append(("text", links.to_html(index=False, escape=False, float_format="%.1f")))
+
+    pages = [{"path": "index.html", "root": "", "title": "Rapport hebdomadaire", "blocks": overview}]
+
+    # Une page par service
+    alerts_by_ward = {ward: dict(tuple(alerts.groupby("Antibiotic", sort=False)))
+                      for ward, alerts in resistance_alerts.groupby("Service", sort=False)}
+    in_period = (weeks >= cube.dates[start]) & (weeks <= cube.dates[end])
+    for ward in wards:
+        blocks = [("heading", 1, f"{ward} ({period})"), ("text", '<a href="../index.html">← Synthèse</a>')]
+        blocks += _phenotype_blocks(cube, start, end, ward)
+        ward_groups = _ward_groups(series, weeks, tested, resistant, ward, in_period)
+        ward_alerts = alerts_by_ward.get(ward, {})
+        blocks.append(("heading", 2, f"📆 Résistance hebdomadaire par antibiotique (séries d'au moins "
+                                     f"{SERIES_MIN_TESTS} tests)"))
+        for abx in sorted(ward_groups):
+            blocks.append(("resistance", {abx: ward_groups[abx]}, [abx], f"{ward} - %R hebdomadaire - {abx}"))
+            if abx in ward_alerts:
+                blocks.append(("table", ward_alerts[abx]))
+        pages.append({"path": paths[ward], "root": "../", "title": ward, "blocks": blocks})
+    return pages
+
+
+def export_report(output=DEFAULT_OUTPUT, start=None, end=None, dedup=None,
+                  min_isolates=MIN_WARD_ISOLATES, jobs=None, archive=False):
+    pages = build_pages(start, end, dedup, min_isolates)
+    os.makedirs(os.path.join(output, "services"), exist_ok=True)
+    with open(os.path.join(output, PLOTLY_JS), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    # Tous les blocs de toutes les pages passent dans le même pool, pour que
+    # la synthèse (beaucoup de figures) ne bloque pas un seul processus.
+    blocks = [block for page in pages for block in page["blocks"]]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        rendered = list(map(_render, blocks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            rendered = list(executor.map(_render, blocks, chunksize=max(1, len(blocks) // (jobs * 4))))
+
+    parts = iter(rendered)
+    for page in pages:
+        body = "\n".join(next(parts) for _ in page["blocks"])
+        with open(os.path.join(output, page["path"]), "w", encoding="utf-8") as f:
+            f.write(PAGE.format(title=html.escape(page["title"]), root=page["root"], plotly=PLOTLY_JS, body=body))
+    if archive:
+        shutil.make_archive(output, "zip", output)
+    return len(pages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export statique du rapport hebdomadaire (HTML autonome)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Répertoire du rapport")
+    parser.add_argument("--start", help="Première semaine, ex. 2024-S01")
+    parser.add_argument("--end", help="Dernière semaine, ex. 2024-S52")
+    parser.add_argument("--dedup", choices=list(WINDOWS), help="Premier isolat par patient (défaut : tous les isolats)")
+    parser.add_argument("--min-isolates", type=int, default=MIN_WARD_ISOLATES,
+                        help="Isolats minimum pour qu'un service ait sa page")
+    parser.add_argument("--jobs", type=int, help="Processus de rendu (défaut : nombre de cœurs)")
+    parser.add_argument("--zip", action="store_true", help="Produire aussi une archive .zip du rapport")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    n = export_report(args.output, args.start, args.end, args.dedup, args.min_isolates, args.jobs, args.zip)
+    print(f"{n} page(s) écrite(s) dans {args.output} en {time.perf_counter() - started:.1f} s")
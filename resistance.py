@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from category_index import CategoryIndex
+from cube import ALL_WARDS, WARD_COLUMN
+from diagnostics import timed
+from isolates import DATE_COLUMN, add_iso_week
+from sir_matrix import INTERMEDIATE, RESISTANT, SUSCEPTIBLE, SIRMatrix
+
+# %R, %I, %S et nombre de tests pour tous les antibiotiques en une passe :
+# un unique bincount sur (période, antibiotique, résultat) appliqué à la
+# matrice int8 des résultats donne tous les effectifs.
+
+# Séries antibiotique x service : on ne garde que celles assez testées
+# pour qu'un %R ait un sens.
+SERIES_MIN_TESTS = 30
+
+
+def _period_table(matrix, period_index, n_periods):
+    n_abx = len(matrix.columns)
+    key = (period_index[:, None] * n_abx + np.arange(n_abx)) * 4 + matrix.codes
+    counts = np.bincount(key.ravel(), minlength=n_periods * n_abx * 4)
+    counts = counts.reshape(n_periods * n_abx, 4)
+
+    tested = counts[:, 1:].sum(axis=1)
+    out = pd.DataFrame({
+        "Antibiotic": np.tile(matrix.names, n_periods),
+        "Code": np.tile(matrix.columns, n_periods),
+        "Total Tests": tested,
+        "Resistant": counts[:, RESISTANT],
+        "Intermediate": counts[:, INTERMEDIATE],
+        "Susceptible": counts[:, SUSCEPTIBLE],
+    })
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for label, code in (("% Resistance", RESISTANT), ("% Intermediate", INTERMEDIATE), ("% Susceptible", SUSCEPTIBLE)):
+            out[label] = counts[:, code] / tested * 100
+    return out, np.repeat(np.arange(n_periods), n_abx)
+
+
+@timed("resistance_melt")
+def resistance_by_period(df, period="week", matrix=None):
+    # Table longue : une ligne par (période, antibiotique testé au moins une fois).
+    # matrix : SIRMatrix déjà encodée pour df (sinon encodée ici).
+    if matrix is None:
+        matrix = SIRMatrix.from_frame(df)
+    df = add_iso_week(df)
+    matrix = matrix.align(df.index)
+
+    if period == "week":
+        keys = df[["Année", "Semaine"]].to_numpy()
+    elif period == "month":
+        dates = df[DATE_COLUMN]
+        keys = np.column_stack([dates.dt.year.to_numpy(), dates.dt.month.to_numpy()])
+    else:
+        raise ValueError(f"Période inconnue : {period}")
+    periods, period_index = np.unique(keys, axis=0, return_inverse=True)
+
+    out, rows = _period_table(matrix, period_index.ravel(), len(periods))
+    if period == "week":
+        out.insert(0, "Année", periods[rows, 0])
+        out.insert(1, "Week", periods[rows, 1])
+        out.insert(2, "Date", pd.to_datetime(
+            [f"{year}-W{week:02d}-1" for year, week in periods[rows]], format="%G-W%V-%u"
+        ))
+    else:
+        out.insert(0, "Année", periods[rows, 0])
+        out.insert(1, "Month", pd.to_datetime(
+            {"year": periods[rows, 0], "month": periods[rows, 1], "day": 1}
+        ))
+    return out[out["Total Tests"] > 0].reset_index(drop=True)
+
+
+def weekly_resistance(df, matrix=None):
+    return resistance_by_period(df, "week", matrix)
+
+
+def monthly_resistance(df, matrix=None):
+    return resistance_by_period(df, "month", matrix)
+
+
+@timed("resistance_series")
+def resistance_series(df, matrix=None, min_tests=SERIES_MIN_TESTS):
+    # Séries hebdomadaires (semaines contiguës) de tests et de résistants pour
+    # chaque couple antibiotique x service, plus « tous services ».
+    # Retourne (series, dates, tested, resistant) : series décrit les lignes
+    # (Antibiotic, Code, Service), tested et resistant sont (séries x semaines).
+    if matrix is None:
+        matrix = SIRMatrix.from_frame(df)
+    df = add_iso_week(df)
+    matrix = matrix.align(df.index)
+
+    dates = df[DATE_COLUMN].dt.normalize()
+    mondays = dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+    first = mondays.min()
+    week_index = ((mondays - first).dt.days // 7).to_numpy()
+    weeks = pd.date_range(first, mondays.max(), freq="7D")
+    wards = CategoryIndex(df[WARD_COLUMN])
+
+    # Chaque test compte pour son service et pour « tous services ».
+    rows, cols = np.nonzero(matrix.codes)
+    n_abx, n_wards = len(matrix.columns), len(wards)
+    pairs = np.concatenate([wards.codes[rows].astype(np.int64) * n_abx + cols, n_wards * n_abx + cols])
+    week = np.tile(week_index[rows], 2)
+    resistant = np.tile(matrix.codes[rows, cols] == RESISTANT, 2)
+
+    keys, series = np.unique(pairs, return_inverse=True)
+    cell = series * len(weeks) + week
+    size = len(keys) * len(weeks)
+    tested = np.bincount(cell, minlength=size).reshape(len(keys), len(weeks))
+    n_resistant = np.bincount(cell[resistant], minlength=size).reshape(len(keys), len(weeks))
+
+    keep = tested.sum(axis=1) >= min_tests
+    keys = keys[keep]
+    labels = np.array(wards.categories + [ALL_WARDS], dtype=object)
+    out = pd.DataFrame({
+        "Antibiotic": np.array(matrix.names, dtype=object)[keys % n_abx],
+        "Code": np.array(matrix.columns, dtype=object)[keys % n_abx],
+        "Service": labels[keys // n_abx],
+    })
+    return out, weeks, tested[keep], n_resistant[keep]
@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+
+# Statistique de scan spatio-temporelle par permutation (Kulldorff 2005,
+# type SaTScan) sur les cellules service x semaine. Un cylindre est un
+# service et une fenêtre de 1 à MAX_WEEKS semaines consécutives ; l'attendu
+# d'une cellule vient des seules marges (cas du service x cas de la semaine
+# / total), ce qui corrige à la fois les différences de taille entre
+# services et les variations globales d'activité. Pour chaque cylindre :
+#   LLR = c ln(c / mu) + (C - c) ln((C - c) / (C - mu))  si c > mu.
+# La significativité vient de REPLICATES permutations des semaines entre
+# les cas (marges conservées, donc attendus inchangés) : p = rang / (R + 1).
+# Les réplicats sont calculés par lots vectorisés (plusieurs permutations
+# à la fois) et répartis sur un pool de threads : les noyaux NumPy
+# relâchent le GIL, et un pool de processus relancerait la page Streamlit
+# (__main__) dans chaque worker.
+MAX_WEEKS = 8
+REPLICATES = 999
+MIN_CASES = 2
+ALPHA = 0.05
+BATCH_CELLS = 1_000_000
+
+
+def _window_sums(counts, max_weeks):
+    # (..., semaines) -> (..., début, longueur) : sommes des fenêtres,
+    # tronquées en fin de période.
+    n = counts.shape[-1]
+    cum = np.concatenate([np.zeros(counts.shape[:-1] + (1,), dtype=counts.dtype), np.cumsum(counts, axis=-1)], axis=-1)
+    start = np.arange(n)[:, None]
+    stop = np.minimum(start + np.arange(1, max_weeks + 1), n)
+    return cum[..., stop] - cum[..., np.broadcast_to(start, stop.shape)]
+
+
+def _llr(observed, expected, total):
+    observed = observed.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        outside = np.where(observed < total, (total - observed) * np.log((total - observed) / (total - expected)), 0)
+        llr = observed * np.log(observed / expected) + outside
+    return np.where((observed >= MIN_CASES) & (observed > expected), llr, 0)
+
+
+def _cylinders(counts, expected, max_weeks):
+    # counts (lots x services x semaines) -> (lot, service, début, longueur,
+    # observés, LLR). À effectif égal, l'attendu croît avec la fenêtre et le
+    # LLR décroît : le maximum est atteint pour une fenêtre qui commence sur
+    # une semaine non vide. Seules ces fenêtres sont évaluées, pas la grille.
+    _, n_wards, n_weeks = counts.shape
+    total = counts[0].sum()
+    cum = np.concatenate([np.zeros(counts.shape[:-1] + (1,), dtype=counts.dtype), np.cumsum(counts, axis=-1)], axis=-1)
+    cell = np.flatnonzero(counts)
+    row, start = np.divmod(cell, n_weeks)
+    batch, ward = np.divmod(row, n_wards)
+    length = np.arange(max_weeks)
+    valid = start[:, None] + length < n_weeks
+    first = (row * (n_weeks + 1) + start)[:, None]
+    observed = np.take(cum, np.where(valid, first + length + 1, first)) - np.take(cum, first)
+    mu = np.take(expected, (ward * n_weeks + start)[:, None] * max_weeks + length)
+    cells, length = np.nonzero(valid)
+    return batch[cells], ward[cells], start[cells], length, observed[valid], _llr(observed[valid], mu[valid], total)
+
+
+def _replicates(wards, weeks, shape, max_weeks, expected, n, seed):
+    # Maximum du LLR pour n permutations (exécuté dans un thread du pool).
+    rng = np.random.default_rng(seed)
+    n_wards, n_weeks = shape
+    batch = max(1, BATCH_CELLS // (n_wards * n_weeks))
+    maxima = np.zeros(n)
+    for done in range(0, n, batch):
+        b = min(batch, n - done)
+        permuted = rng.permuted(np.broadcast_to(weeks, (b, len(weeks))), axis=1)
+        cells = (np.arange(b)[:, None] * n_wards + wards) * n_weeks + permuted
+        counts = np.bincount(cells.ravel(), minlength=b * n_wards * n_weeks).reshape(b, n_wards, n_weeks)
+        replicate, _, _, _, _, llr = _cylinders(counts, expected, max_weeks)
+        np.maximum.at(maxima, done + replicate, llr)
+    return maxima
+
+
+@timed("space_time_scan")
+def space_time_scan(counts, weeks, wards, max_weeks=MAX_WEEKS, replicates=REPLICATES, jobs=None, seed=0):
+    # counts : cas (semaines x services) ; weeks, wards : libellés des axes.
+    # Retourne le meilleur cylindre de chaque service, classé par LLR, avec
+    # sa p-valeur Monte Carlo (comparée au maximum global de chaque réplicat).
+    counts = np.asarray(counts, dtype=np.int64).T
+    # Les services sans cas de la période n'entrent dans aucun cylindre.
+    present = counts.sum(axis=1) > 0
+    counts, wards = counts[present], np.asarray(wards, dtype=object)[present]
+    n_wards, n_weeks = counts.shape
+    max_weeks = min(max_weeks, n_weeks)
+    total = int(counts.sum())
+    columns = ["Service", "Début", "Fin", "Semaines", "Observés", "Attendus", "O/A", "LLR", "p"]
+    if total == 0:
+        return pd.DataFrame(columns=columns)
+
+    expected = counts.sum(axis=1)[:, None, None] * _window_sums(counts.sum(axis=0), max_weeks)[None] / total
+    _, ward, start, length, observed, llr = _cylinders(counts[None], expected, max_weeks)
+
+    # Cas individuels (service, semaine) à permuter.
+    ward_of_case = np.repeat(np.repeat(np.arange(n_wards), n_weeks), counts.ravel())
+    week_of_case = np.repeat(np.tile(np.arange(n_weeks), n_wards), counts.ravel())
+    jobs = max(1, min(jobs or os.cpu_count() or 1, replicates))
+    seeds = np.random.SeedSequence(seed).spawn(jobs)
+    sizes = [len(part) for part in np.array_split(np.arange(replicates), jobs)]
+    args = (ward_of_case, week_of_case, (n_wards, n_weeks), max_weeks, expected)
+    if jobs == 1:
+        maxima = _replicates(*args, replicates, seeds[0])
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            maxima = np.concatenate(list(executor.map(_replicates, *zip(*[args + (n, s) for n, s in zip(sizes, seeds)]))))
+
+    # Meilleur cylindre de chaque service.
+    order = np.lexsort((-llr, ward))
+    best = order[np.r_[True, ward[order][1:] != ward[order][:-1]]]
+    best = best[llr[best] > 0]
+    ward, start, length, observed, llr = ward[best], start[best], length[best], observed[best], llr[best]
+    mu = expected[ward, start, length]
+    weeks = np.asarray(weeks)
+    out = pd.DataFrame({
+        "Service": wards[ward],
+        "Début": weeks[start],
+        "Fin": weeks[start + length],
+        "Semaines": length + 1,
+        "Observés": observed,
+        "Attendus": mu,
+        "O/A": observed / mu,
+        "LLR": llr,
+        "p": (1 + (maxima[None, :] >= llr[:, None]).sum(axis=1)) / (replicates + 1),
+    }, columns=columns)
+    return out.sort_values("LLR", ascending=False, ignore_index=True)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+from isolates import antibiotic_name, result_columns
+
+# Représentation compacte des résultats d'antibiogramme : un tableau int8
+# contigu (isolats x antibiotiques) au lieu de ~240 colonnes de chaînes Python.
+# 0 = non testé, 1 = S, 2 = I, 3 = R. "F" (sensible à forte posologie) est
+# rangé avec I, comme dans les agrégats %I.
+NOT_TESTED, SUSCEPTIBLE, INTERMEDIATE, RESISTANT = range(4)
+RESULT_CODES = {"S": SUSCEPTIBLE, "I": INTERMEDIATE, "F": INTERMEDIATE, "R": RESISTANT}
+RESULT_LABELS = np.array([np.nan, "S", "I", "R"], dtype=object)
+
+
+class SIRMatrix:
+    def __init__(self, codes, columns, index=None):
+        self.codes = np.ascontiguousarray(codes, dtype=np.int8)
+        self.columns = list(columns)
+        self.names = [antibiotic_name(c) for c in self.columns]
+        self.index = pd.RangeIndex(len(self.codes)) if index is None else pd.Index(index)
+        self._positions = {col: j for j, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        columns = result_columns(df) if columns is None else list(columns)
+        results = df[columns]
+        codes = np.zeros(results.shape, dtype=np.int8)
+        for value, code in RESULT_CODES.items():
+            codes[results.eq(value).to_numpy(dtype=bool, na_value=False)] = code
+        return cls(codes, columns, df.index)
+
+    def to_frame(self):
+        return pd.DataFrame(RESULT_LABELS[self.codes], index=self.index, columns=self.columns)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def positions(self, columns):
+        return [self._positions[c] for c in columns if c in self._positions]
+
+    def column(self, code):
+        # Vue sur la colonne, sans copie.
+        return self.codes[:, self._positions[code]]
+
+    def align(self, index):
+        # Lignes correspondant à un sous-ensemble d'isolats (après filtrage
+        # des dates, d'un service...) ; aucune copie si rien n'a été retiré.
+        if len(index) == len(self.index) and index.equals(self.index):
+            return self
+        rows = self.index.get_indexer(index)
+        return SIRMatrix(self.codes[rows], self.columns, index)
+
+    def bitplane(self, code):
+        # Plan de bits compact (8 antibiotiques par octet) pour un résultat donné.
+        return np.packbits(self.codes == code, axis=1)
+
+    def tested(self):
+        return self.codes != NOT_TESTED
+
+    def resistant(self):
+        return self.codes == RESISTANT
+
+
+@timed("sir_matrix")
+def split_isolates(df):
+    # Sépare l'export brut en colonnes d'identification (DataFrame léger)
+    # et matrice de résultats compacte.
+    matrix = SIRMatrix.from_frame(df)
+    return df.drop(columns=matrix.columns), matrix
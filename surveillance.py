@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import ALL_WARDS
+from isolates import DATE_COLUMN
+from phenotypes import PHENOTYPES, weekly_phenotypes
+from resistance import resistance_series
+from sir_matrix import SIRMatrix
+
+# Surveillance en ligne : CUSUM, EWMA et référence glissante pour chaque
+# série hebdomadaire (effectifs par phénotype, %R par antibiotique tous
+# services). L'état tient dans quelques tableaux (une case par série) ;
+# une nouvelle semaine le met à jour en O(1) par série, sans relire
+# l'historique. Il est sauvegardé entre deux exécutions.
+#
+# Chaque valeur est centrée-réduite sur les BASELINE_WEEKS semaines
+# précédentes (z), puis :
+#   CUSUM+ = max(0, CUSUM+ + z - k), CUSUM- = max(0, CUSUM- - z - k), signal si > h ;
+#   EWMA = lambda z + (1 - lambda) EWMA, signal si |EWMA| > L sqrt(lambda / (2 - lambda)).
+BASELINE_WEEKS = 12
+MIN_BASELINE = 4
+SD_FLOOR = 1.0
+CUSUM_K = 0.5
+CUSUM_H = 4.0
+EWMA_LAMBDA = 0.3
+EWMA_L = 3.0
+STATE_FILE = "surveillance.npz"
+
+_ARRAYS = ["buffer", "total", "squares", "count", "value", "z", "cusum_high", "cusum_low", "ewma", "last_signal"]
+
+
+def week_values(df, matrix=None):
+    # (clés, libellés, lundis, valeurs séries x semaines) à partir d'isolats.
+    if matrix is None:
+        matrix = SIRMatrix.from_frame(df)
+    series, weeks, tested, resistant = resistance_series(df, matrix, min_tests=1)
+    overall = (series["Service"] == ALL_WARDS).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(tested > 0, resistant / tested * 100, np.nan)[overall]
+
+    counts = weekly_phenotypes(df, matrix).set_index("Date")[PHENOTYPES + ["Total"]]
+    counts = counts.reindex(weeks, fill_value=0).to_numpy(dtype=np.float64).T
+
+    codes, names = series.loc[overall, "Code"], series.loc[overall, "Antibiotic"]
+    keys = PHENOTYPES + ["Total"] + [f"%R {code}" for code in codes]
+    labels = [f"Cas {p}" for p in PHENOTYPES + ["Total"]] + [f"%R {name}" for name in names]
+    return keys, labels, weeks, np.vstack([counts, percent])
+
+
+def closed_weeks(weeks, latest):
+    # Seules les semaines terminées (dimanche <= dernière date reçue) font
+    # avancer l'état : une semaine partielle fausserait CUSUM et EWMA.
+    return weeks + pd.Timedelta(days=6) <= pd.Timestamp(latest)
+
+
+class Surveillance:
+    def __init__(self, keys=(), labels=()):
+        self.keys = pd.Index(list(keys), dtype=object)
+        self.labels = np.array(list(labels), dtype=object)
+        self.week = None
+        self.updates = 0
+        n = len(self.keys)
+        self.buffer = np.full((n, BASELINE_WEEKS), np.nan)
+        self.total = np.zeros(n)
+        self.squares = np.zeros(n)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.value = np.full(n, np.nan)
+        self.z = np.full(n, np.nan)
+        self.cusum_high = np.zeros(n)
+        self.cusum_low = np.zeros(n)
+        self.ewma = np.zeros(n)
+        self.last_signal = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _extend(self, keys, labels):
+        new = [i for i, key in enumerate(keys) if key not in self.keys]
+        if not new:
+            return
+        fresh = Surveillance([keys[i] for i in new], [labels[i] for i in new])
+        self.keys = self.keys.append(fresh.keys)
+        self.labels = np.concatenate([self.labels, fresh.labels])
+        for name in _ARRAYS:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(fresh, name)]))
+
+    def update(self, week, keys, labels, values):
+        # Une semaine de valeurs (NaN = pas de mesure : l'état de la série ne bouge pas).
+        week = pd.Timestamp(week)
+        if self.week is not None and week <= self.week:
+            raise ValueError(f"Semaine déjà traitée : {week.date()}")
+        self._extend(keys, labels)
+        x = np.full(len(self), np.nan)
+        x[self.keys.get_indexer(keys)] = values
+
+        # Référence : les semaines précédentes uniquement (surveillance prospective).
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.total / self.count
+            sd = np.sqrt(np.maximum(self.squares - self.total * mean, 0) / (self.count - 1))
+        sd = np.fmax(sd, SD_FLOOR)
+        ready = (self.count >= MIN_BASELINE) & ~np.isnan(x)
+        z = np.where(ready, (x - mean) / sd, np.nan)
+
+        self.cusum_high = np.where(ready, np.maximum(0, self.cusum_high + z - CUSUM_K), self.cusum_high)
+        self.cusum_low = np.where(ready, np.maximum(0, self.cusum_low - z - CUSUM_K), self.cusum_low)
+        self.ewma = np.where(ready, EWMA_LAMBDA * z + (1 - EWMA_LAMBDA) * self.ewma, self.ewma)
+        signal = ready & self.signals()
+        self.last_signal[signal] = week.to_datetime64()
+        # Après un signal, le CUSUM repart de zéro pour détecter le suivant.
+        self.cusum_high[signal] = 0
+        self.cusum_low[signal] = 0
+        self.value = np.where(np.isnan(x), self.value, x)
+        self.z = z
+
+        # Fenêtre glissante : la valeur entrante remplace la plus ancienne.
+        slot = self.updates % BASELINE_WEEKS
+        old = self.buffer[:, slot]
+        seen = ~np.isnan(old)
+        self.total[seen] -= old[seen]
+        self.squares[seen] -= old[seen] ** 2
+        self.count -= seen
+        new = ~np.isnan(x)
+        self.total[new] += x[new]
+        self.squares[new] += x[new] ** 2
+        self.count += new
+        self.buffer[:, slot] = x
+        self.updates += 1
+        self.week = week
+        return signal
+
+    def signals(self):
+        ewma_limit = EWMA_L * np.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))
+        return (self.cusum_high > CUSUM_H) | (self.cusum_low > CUSUM_H) | (np.abs(self.ewma) > ewma_limit)
+
+    def advance(self, df, matrix=None, latest=None):
+        # Ajoute les semaines closes postérieures à l'état ; retourne leur nombre.
+        keys, labels, weeks, values = week_values(df, matrix)
+        latest = pd.to_datetime(df[DATE_COLUMN]).max() if latest is None else latest
+        todo = closed_weeks(weeks, latest)
+        if self.week is not None:
+            todo &= weeks > self.week
+        for j in np.flatnonzero(todo):
+            self.update(weeks[j], keys, labels, values[:, j])
+        return int(todo.sum())
+
+    def table(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.total / self.count
+        return pd.DataFrame({
+            "Série": self.labels,
+            "Dernière valeur": self.value,
+            "Référence": mean,
+            "z": self.z,
+            "CUSUM+": self.cusum_high,
+            "CUSUM-": self.cusum_low,
+            "EWMA": self.ewma,
+            "Signal": self.last_signal == (np.datetime64("NaT") if self.week is None else self.week.to_datetime64()),
+            "Dernier signal": self.last_signal,
+        })
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        week = np.datetime64("NaT") if self.week is None else self.week.to_datetime64()
+        np.savez(
+            tmp, keys=np.array(self.keys, dtype=str), labels=self.labels.astype(str),
+            week=np.array(week, dtype="datetime64[ns]"), updates=self.updates,
+            **{name: getattr(self, name) for name in _ARRAYS},
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            state = cls(data["keys"].tolist(), data["labels"].tolist())
+            for name in _ARRAYS:
+                setattr(state, name, data[name])
+            week = data["week"][()]
+            state.week = None if np.isnat(week) else pd.Timestamp(week)
+            state.updates = int(data["updates"])
+        return state
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from data_cache import read_excel_cached
+from isolates import DATE_COLUMN, SOURCE_FILE
+
+# Générateur d'exports d'isolats synthétiques au schéma de
+# staphylococcus_2024_new.xlsx (mêmes colonnes, dans le même ordre), pour
+# mesurer les pages à 10x ou 100x le volume actuel. Les distributions sont
+# tirées de l'export réel :
+#   - profil de résultats S/I/R/F : ligne réelle entière (les co-résistances,
+#     donc les phénotypes MRSA / VRSA, restent réalistes) ;
+#   - service, demandeur, nature, germe et jour de l'année : une autre ligne
+#     réelle, décalée d'un nombre entier de 52 semaines pour couvrir
+#     plusieurs années sans changer la saisonnalité ni le jour de semaine ;
+#   - patients : autant de prélèvements par patient en moyenne que le réel.
+
+
+def _format_dates(dates):
+    # Même présentation que l'export (texte m/j/aaaa, sans zéros de tête).
+    text = (dates.dt.month.astype("Int64").astype(str) + "/" + dates.dt.day.astype("Int64").astype(str)
+            + "/" + dates.dt.year.astype("Int64").astype(str))
+    return text.where(dates.notna(), None)
+
+
+def synthetic_isolates(rows, years=1, seed=0, source=SOURCE_FILE):
+    real = read_excel_cached(source, sheet_name="Sheet1")
+    rng = np.random.default_rng(seed)
+    profile = rng.integers(len(real), size=rows)
+    context = rng.integers(len(real), size=rows)
+
+    df = real.iloc[profile].reset_index(drop=True)
+    ctx = real.iloc[context].reset_index(drop=True)
+    for col in ["DEMANDEUR", "LIBELLE_DEMANDEUR", "NATURE", "CODE_GERME", "LIB_GERME"]:
+        df[col] = ctx[col]
+
+    sampled = pd.to_datetime(ctx[DATE_COLUMN], format="%m/%d/%Y", errors="coerce")
+    stay = sampled - pd.to_datetime(ctx["DATE_ENTREE"], format="%m/%d/%Y", errors="coerce")
+    sampled = sampled + pd.to_timedelta(rng.integers(years, size=rows) * 364, unit="D")
+
+    # Identifiants croissants avec la date, comme dans l'export.
+    order = np.argsort(sampled.to_numpy(), kind="stable")
+    df = df.iloc[order].reset_index(drop=True)
+    sampled, stay = sampled.iloc[order].reset_index(drop=True), stay.iloc[order].reset_index(drop=True)
+    df[DATE_COLUMN] = _format_dates(sampled)
+    df["DATE_ENTREE"] = _format_dates(sampled - stay)
+    df["ID_DEMANDE"] = int(real["ID_DEMANDE"].min()) + np.arange(rows)
+    df["NUM_SPECIMEN"] = [f"Q{242000000 + i}" for i in range(rows)]
+
+    patients = max(1, round(rows * real["IPP_PASTEL"].nunique() / len(real)))
+    df["IPP_PASTEL"] = (2100000000 + rng.integers(patients, size=rows)).astype(str)
+    return df[real.columns]
+
+
+def write_export(df, path):
+    df.to_excel(path, sheet_name="Sheet1", index=False)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from antibiotype import COMMON_SHARE, find_clusters
+from cube import WARD_COLUMN
+from dedup import PATIENT_COLUMN
+from isolates import DATE_COLUMN
+from sir_matrix import SIRMatrix
+
+
+def _isolates(n):
+    meta = pd.DataFrame({
+        DATE_COLUMN: pd.date_range("2024-01-01", periods=n, freq="D"),
+        WARD_COLUMN: ["Réanimation"] * n,
+        PATIENT_COLUMN: np.arange(n),
+    })
+    results = pd.DataFrame({"OX": ["R"] * n, "VA": ["S"] * n, "E": ["R"] * n})
+    return meta, SIRMatrix.from_frame(results, ["OX", "VA", "E"])
+
+
+@pytest.mark.parametrize("n", [0, int(1 / COMMON_SHARE) - 5])
+def test_no_eligible_isolates(n):
+    # Trop peu d'isolats : tous les profils dépassent COMMON_SHARE.
+    clusters, members = find_clusters(*_isolates(n))
+    assert clusters.empty
+    assert members.empty
+    assert "Cluster" in clusters.columns
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import datasets
+import figure_cache
+import watcher
+from cube import ALL_NATURES, ALL_WARDS
+from dedup import WINDOWS
+from diagnostics import finish_run, stage
+from phenotypes import PHENOTYPES
+
+# Éléments d'interface communs aux tableaux de bord.
+RAW_COUNTS = "Tous les isolats"
+DETAIL_COLUMNS = ["DATE_PRELEVEMENT", "LIBELLE_DEMANDEUR", "NATURE", "ID_DEMANDE", "NUM_SPECIMEN"]
+
+# Une page qui modifie sa vue d'un jeu partagé (fillna, nouvelle colonne...)
+# obtient sa propre copie sans toucher au jeu partagé. Réglage global limité
+# au serveur des tableaux de bord : batch, report et bench n'importent pas ce
+# module.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Toutes les pages importent ce module : le serveur démarre ici son unique
+# thread de rafraîchissement des jeux partagés.
+watcher.start()
+
+
+def ward_nature_filters(cube):
+    # Filtres service / nature de prélèvement (à appeler dans st.sidebar).
+    ward = st.selectbox("Service", [ALL_WARDS] + cube.wards)
+    nature = st.selectbox("Nature de prélèvement", [ALL_NATURES] + cube.natures)
+    return (None if ward == ALL_WARDS else ward), (None if nature == ALL_NATURES else nature)
+
+
+def drilldown(cube, meta, start, end, ward=None, nature=None):
+    st.subheader("🔎 Détail par service")
+    breakdown = cube.ward_breakdown(start, end, nature)
+    st.dataframe(breakdown, use_container_width=True, hide_index=True)
+
+    rows = cube.isolate_rows(start, end, ward, nature)
+    st.markdown(f"### 📋 Isolats de la sélection ({len(rows)})")
+    detail = meta.loc[cube.row_labels[rows], DETAIL_COLUMNS].copy()
+    detail["Phénotype"] = np.array(PHENOTYPES)[cube.isolate_phenotypes[rows]]
+    st.dataframe(detail, use_container_width=True, hide_index=True)
+
+
+def dedup_filter():
+    # Comptage brut ou premier isolat par patient (à appeler dans st.sidebar).
+    options = [None] + list(WINDOWS)
+    return st.radio(
+        "Comptage",
+        options,
+        format_func=lambda window: RAW_COUNTS if window is None else WINDOWS[window],
+    )
+
+
+def plotly_chart(fig):
+    # Sérialisation et envoi de la figure au navigateur, mesurés.
+    with stage("plotly_chart", len(fig.data)):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def pyplot(fig):
+    with stage("pyplot"):
+        st.pyplot(fig)
+
+
+def diagnostics_panel():
+    # À appeler en fin de page : journalise les étapes de l'exécution et,
+    # sur demande, les affiche dans la barre latérale.
+    records = finish_run()
+    with st.sidebar:
+        if not st.checkbox("🩺 Diagnostics", key="diagnostics"):
+            return
+        st.caption(f"Exécution : {sum(r['seconds'] for r in records if r['depth'] == 0):.3f} s")
+        if records:
+            table = pd.DataFrame(records)
+            table.insert(0, "Étape", ["· " * d + s for d, s in zip(table.pop("depth"), table.pop("stage"))])
+            st.dataframe(table.rename(columns={
+                "seconds": "Durée (s)", "rows_in": "Lignes entrée", "rows_out": "Lignes sortie",
+                "memory_mb": "Δ mémoire (Mo)", "cache": "Cache",
+            }), hide_index=True)
+        stats = figure_cache.stats()
+        st.caption(f"Cache des figures : {stats['hits']} hit(s), {stats['misses']} miss, "
+                   f"{stats['entries']} figure(s), {stats['bytes'] / 2 ** 20:.1f} Mo")
+        status = watcher.status()
+        if status and status["refreshed"]:
+            st.caption(f"Données : génération {datasets.generation()}, "
+                       f"chargées à {time.strftime('%H:%M:%S', time.localtime(status['refreshed']))}")
+        if status and status["error"]:
+            st.warning(f"Rafraîchissement en échec, données précédentes servies : {status['error']}")
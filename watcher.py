@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+
+import datasets
+from ingest import STORE_DIR
+from isolates import SOURCE_FILE
+from surveillance import STATE_FILE
+
+# Rafraîchissement des jeux partagés hors du chemin des requêtes. Un thread
+# de fond relève (taille, date de modification) de chaque source toutes les
+# POLL_SECONDS secondes. Quand l'empreinte a changé puis est restée stable
+# pendant un relevé (fichier encore en cours de copie sinon), il reconstruit
+# tous les jeux déjà servis dans un cache de préparation et les bascule
+# d'un coup (datasets.refresh) : les pages lisent l'ancienne génération
+# pendant la reconstruction, jamais un classeur à analyser à froid.
+# Au démarrage, les jeux de WARM sont chargés avant la première requête.
+POLL_SECONDS = 5
+SOURCES = [
+    SOURCE_FILE,
+    "staph_aureus_phenotypes.xlsx",
+    datasets.ATB_FILE,
+    "weekly_abx_resistance.xlsx",
+    # Stock partitionné et état de surveillance, réécrits par ingest.py.
+    os.path.join(STORE_DIR, "watermark.json"),
+    os.path.join(STORE_DIR, STATE_FILE),
+]
+# Jeux des vues par défaut (comptage brut) de toutes les pages.
+WARM = [
+    datasets.load_cube,
+    datasets.load_phenotypes,
+    datasets.load_daily_phenotypes,
+    datasets.load_resistance_groups,
+    datasets.load_resistance_series,
+    datasets.load_atb_percent_r_groups,
+    datasets.load_atb_percent_r_wide,
+    datasets.load_surveillance,
+]
+
+_logger = logging.getLogger("watcher")
+_lock = threading.Lock()
+_watcher = None
+
+
+def fingerprint(paths=SOURCES):
+    # (taille, date de modification) de chaque source présente : un stat par fichier.
+    result = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        result[path] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+
+class Watcher(threading.Thread):
+    def __init__(self, sources=SOURCES, interval=POLL_SECONDS, warm=WARM):
+        super().__init__(name="datasets-watcher", daemon=True)
+        self.sources = sources
+        self.interval = interval
+        self.warm = warm
+        self.refreshed = None
+        self.error = None
+        self._stopped = threading.Event()
+
+    def _load(self, action):
+        try:
+            action()
+        except Exception as exc:
+            # Source illisible (copie partielle...) : on garde ce qui est servi.
+            self.error = f"{type(exc).__name__}: {exc}"
+            _logger.exception("Échec du rafraîchissement des jeux partagés")
+            return False
+        self.refreshed = time.time()
+        self.error = None
+        return True
+
+    def run(self):
+        current = fingerprint(self.sources)
+        # Premier chargement directement dans le cache courant : une requête
+        # concurrente attend le même calcul au lieu de le refaire.
+        self._load(lambda: [load() for load in self.warm])
+        pending = None
+        while not self._stopped.wait(self.interval):
+            seen = fingerprint(self.sources)
+            if seen == current:
+                pending = None
+            elif seen != pending:
+                pending = seen
+            elif self._load(lambda: datasets.refresh(self.warm)):
+                current, pending = seen, None
+            else:
+                pending = None
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start():
+    # Un seul watcher par processus serveur, quel que soit le nombre de pages.
+    global _watcher
+    with _lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = Watcher()
+            _watcher.start()
+        return _watcher
+
+
+def status():
+    return None if _watcher is None else {"refreshed": _watcher.refreshed, "error": _watcher.error}
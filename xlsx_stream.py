@@ -0,0 +1,169 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Lecteur XLSX en flux : on parcourt sheet1.xml avec iterparse, on ne garde que
+# les colonnes demandées et on ne résout les chaînes partagées qu'à la demande.
+# La mémoire et le temps suivent la projection, pas la largeur de la feuille.
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_DIGITS = "0123456789"
+
+
+class _SharedStrings:
+    # sharedStrings.xml est lu au fil de l'eau et seulement jusqu'au plus grand
+    # indice demandé : lire l'en-tête n'oblige pas à charger les 11k chaînes.
+    def __init__(self, archive):
+        self._items = []
+        self._events = None
+        self._root = None
+        if "xl/sharedStrings.xml" in archive.namelist():
+            self._events = ET.iterparse(archive.open("xl/sharedStrings.xml"), events=("start", "end"))
+
+    def __getitem__(self, index):
+        while len(self._items) <= index:
+            if not self._advance():
+                raise IndexError(f"chaîne partagée {index} absente du classeur")
+        return self._items[index]
+
+    def _advance(self):
+        if self._events is None:
+            return False
+        for event, elem in self._events:
+            if self._root is None:
+                self._root = elem
+            if event == "end" and elem.tag == NS + "si":
+                # Texte simple (<t>) ou enrichi (plusieurs <r><t>).
+                self._items.append("".join(t.text or "" for t in elem.iter(NS + "t")))
+                self._root.clear()
+                return True
+        self._events = None
+        return False
+
+
+def _sheet_path(archive, sheet_name):
+    if sheet_name is None:
+        return "xl/worksheets/sheet1.xml"
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+    rel_attr = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+    for sheet in workbook.iter(NS + "sheet"):
+        if sheet.get("name") == sheet_name:
+            target = targets[sheet.get(rel_attr)].lstrip("/")
+            return target if target.startswith("xl/") else "xl/" + target
+    raise ValueError(f"Feuille introuvable : {sheet_name}")
+
+
+def _cell_value(cell, shared):
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(NS + "t"))
+    v = cell.find(NS + "v")
+    if v is None or v.text is None:
+        return None
+    if kind == "s":
+        return shared[int(v.text)]
+    if kind in ("str", "e"):
+        return v.text
+    if kind == "b":
+        return v.text == "1"
+    number = float(v.text)
+    return int(number) if number.is_integer() else number
+
+
+def _to_timestamp(value, cache):
+    if value is None:
+        return pd.NaT
+    ts = cache.get(value)
+    if ts is None:
+        if isinstance(value, (int, float)):
+            ts = pd.Timestamp(EXCEL_EPOCH + timedelta(days=value))
+        else:
+            ts = pd.to_datetime(value, errors="coerce")
+        cache[value] = ts
+    return ts
+
+
+def read_xlsx_header(path, sheet_name=None):
+    # En-têtes de la première ligne, sans parcourir le reste de la feuille.
+    with zipfile.ZipFile(path) as archive:
+        shared = _SharedStrings(archive)
+        for _, elem in ET.iterparse(archive.open(_sheet_path(archive, sheet_name))):
+            if elem.tag == NS + "row":
+                return [str(value) for value in (_cell_value(cell, shared) for cell in elem) if value is not None]
+    return []
+
+
+def read_xlsx_columns(path, columns, sheet_name=None, date_column=None, start=None, end=None):
+    # columns : en-têtes à matérialiser (dans l'ordre voulu).
+    # date_column / start / end : prédicat de période appliqué ligne par ligne
+    # pendant le parcours ; les lignes hors période ne sont jamais stockées.
+    # La colonne de date est renvoyée déjà convertie en datetime.
+    columns = list(columns)
+    if date_column is not None and date_column not in columns:
+        columns.append(date_column)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    with zipfile.ZipFile(path) as archive:
+        shared = _SharedStrings(archive)
+        events = ET.iterparse(archive.open(_sheet_path(archive, sheet_name)), events=("start", "end"))
+        sheet_data = None
+        letters = None
+        date_letter = None
+        date_cache = {}
+        data = {name: [] for name in columns}
+
+        for event, elem in events:
+            if event == "start":
+                if elem.tag == NS + "sheetData":
+                    sheet_data = elem
+                continue
+            if elem.tag != NS + "row":
+                continue
+
+            if letters is None:
+                # Première ligne : correspondance en-tête -> lettre de colonne.
+                header = {}
+                for cell in elem:
+                    value = _cell_value(cell, shared)
+                    if value is not None:
+                        header[str(value)] = cell.get("r").rstrip(_DIGITS)
+                missing = [name for name in columns if name not in header]
+                if missing:
+                    raise KeyError(f"Colonnes absentes de {path} : {missing}")
+                letters = {header[name]: name for name in columns}
+                date_letter = header.get(date_column)
+                sheet_data.clear()
+                continue
+
+            row = {}
+            for cell in elem:
+                letter = cell.get("r").rstrip(_DIGITS)
+                if letter in letters:
+                    row[letters[letter]] = _cell_value(cell, shared)
+            # Les lignes déjà traitées sont détachées : la mémoire reste plate.
+            sheet_data.clear()
+
+            if date_letter is not None:
+                ts = _to_timestamp(row.get(date_column), date_cache)
+                if pd.isna(ts) or (start is not None and ts < start) or (end is not None and ts > end):
+                    continue
+                row[date_column] = ts
+
+            for name in columns:
+                data[name].append(row.get(name))
+
+    df = pd.DataFrame(data, columns=columns)
+    df = df.infer_objects()
+    # Colonne sans aucune valeur : float (NaN), comme avec read_excel.
+    empty = [name for name in columns if df[name].isna().all()]
+    if empty:
+        df[empty] = df[empty].astype(float)
+    if date_column is not None:
+        df[date_column] = pd.to_datetime(df[date_column])
+    return df